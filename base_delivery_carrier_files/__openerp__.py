@@ -54,6 +54,7 @@ Sub-modules already exist to generate file according to specs of :
                 'stock',
                 'delivery'],
     'data': ['carrier_file_view.xml',
+             'carrier_file_data.xml',
              'stock_view.xml',
              'wizard/generate_carrier_files_view.xml',
              'security/ir.model.access.csv'],
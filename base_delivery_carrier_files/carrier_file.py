@@ -20,12 +20,189 @@
 ##############################################################################
 
 import os
+import gzip
 import logging
+import shutil
+import tempfile
+import threading
+import uuid
+import zipfile
+from contextlib import closing, contextmanager
+try:
+    import cStringIO as StringIO
+except ImportError:
+    import StringIO
 
 from openerp import models, fields, api, exceptions
+from openerp.exceptions import except_orm
+from openerp.modules.registry import RegistryManager
+from openerp.tools import ustr
 from openerp.tools.translate import _
 from .generator import new_file_generator
 
+_logger = logging.getLogger(__name__)
+
+# permissions of the files written on the disk, the umask of the
+# process is applied on it when the file is created, as with open()
+FILE_MODE = 0o666
+
+# files written on the disk during the generation runs of the thread,
+# synced to the disk at the end of the outermost run
+_fsync_local = threading.local()
+
+FILE_CHUNK_SIZE = 64 * 1024
+# the compressed files are kept in memory up to this size
+COMPRESSED_SPOOL_MAX_SIZE = 1024 * 1024
+# above this size, the content written to several destinations is shared
+# with the threads in a temporary file instead of a string
+FANOUT_MAX_MEMORY_SIZE = 1024 * 1024
+# number of pickings exported by the scheduler in a transaction
+DEFAULT_EXPORT_CHUNK_SIZE = 500
+
+
+def open_file_content(file_content):
+    """ Return the content of a generated file as a file-like object
+
+    The generators return file-like objects, but the content can also be
+    given as a string by custom generators.
+
+    """
+    if isinstance(file_content, basestring):
+        return StringIO.StringIO(file_content)
+    file_content.seek(0)
+    return file_content
+
+
+def iter_file_chunks(file_content, chunk_size=FILE_CHUNK_SIZE):
+    """ Iterate over the content of a generated file by chunks """
+    file_handle = open_file_content(file_content)
+    while True:
+        chunk = file_handle.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+def atomic_write(full_path, file_content):
+    """ Write a file so that its readers never see it partially written
+
+    The content is written in a hidden temporary file of the same
+    directory, then renamed to its final name.
+
+    :param full_path: path of the file to write
+    :param file_content: content of the file, file-like or string
+    """
+    directory, name = os.path.split(full_path)
+    # not tempfile.mkstemp(), which creates the file readable by its
+    # owner only
+    temp_path = os.path.join(directory,
+                             '.%s.%s.tmp' % (name, uuid.uuid4().hex))
+    fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL,
+                 FILE_MODE)
+    try:
+        with os.fdopen(fd, 'wb', FILE_CHUNK_SIZE) as file_handle:
+            for chunk in iter_file_chunks(file_content):
+                file_handle.write(chunk)
+        os.rename(temp_path, full_path)
+    except Exception:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _fsync_paths(paths):
+    """ Flush the files and their directories to the disk """
+    directories = set()
+    for path in paths:
+        directories.add(os.path.dirname(path))
+        try:
+            fd = os.open(path, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        except OSError:
+            _logger.warning('Could not sync the file %s', path,
+                            exc_info=True)
+    for directory in directories:
+        try:
+            fd = os.open(directory, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        except OSError:
+            _logger.warning('Could not sync the directory %s', directory,
+                            exc_info=True)
+
+
+def schedule_fsync(path):
+    """ Sync a written file at the end of the generation run, or now
+    when no run is in progress
+    """
+    if getattr(_fsync_local, 'depth', 0):
+        _fsync_local.paths.append(path)
+    else:
+        _fsync_paths([path])
+
+
+@contextmanager
+def batched_fsync():
+    """ Sync the files written in the block all together at its end """
+    depth = getattr(_fsync_local, 'depth', 0)
+    if not depth:
+        _fsync_local.paths = []
+    _fsync_local.depth = depth + 1
+    try:
+        yield
+    finally:
+        _fsync_local.depth -= 1
+        if not _fsync_local.depth:
+            paths, _fsync_local.paths = _fsync_local.paths, None
+            _fsync_paths(paths)
+
+
+def _write_file_new_cursor(dbname, uid, context, carrier_file_id,
+                           filename, file_content):
+    """ Write a file with a carrier file configuration in its own
+    transaction, used to write to several destinations in parallel
+
+    The transaction is always rolled back: the values returned by
+    _write_file and the result of the destination are saved by the
+    calling transaction, so nothing is recorded if it fails.
+
+    :param context: context of the thread, it must not share the
+                    mutable values of the calling transaction
+    :param file_content: string or path of the file containing the content
+    :return: tuple (error message if the write failed, None otherwise,
+             result of _write_file)
+    """
+    with api.Environment.manage():
+        registry = RegistryManager.get(dbname)
+        with closing(registry.cursor()) as cr:
+            env = api.Environment(cr, uid, context)
+            carrier_file = env['delivery.carrier.file'].browse(
+                carrier_file_id)
+            try:
+                if isinstance(file_content, basestring):
+                    result = carrier_file._write_file(filename, file_content)
+                else:
+                    with open(file_content[0], 'rb') as file_handle:
+                        result = carrier_file._write_file(filename,
+                                                          file_handle)
+                return None, result
+            except Exception as err:
+                _logger.exception('Could not write the file %s with the '
+                                  'carrier file %s', filename,
+                                  carrier_file_id)
+                if isinstance(err, except_orm):
+                    return ustr(err.value), None
+                return ustr(err), None
+            finally:
+                cr.rollback()
+
 
 class CarrierFile(models.Model):
     _name = 'delivery.carrier.file'
@@ -42,7 +219,8 @@ class CarrierFile(models.Model):
         """
         Selection can be inherited to add more write modes
         """
-        return [('disk', 'Disk')]
+        return [('disk', 'Disk'),
+                ('fanout', 'Several destinations')]
 
     @api.multi
     def _write_file(self, filename, file_content):
@@ -50,22 +228,221 @@ class CarrierFile(models.Model):
         Method responsible of writing the file, on the filesystem or
         by inheriting the module, in the document module as instance
 
+        The ids of the pickings contained in the file are in the
+        'carrier_file_picking_ids' key of the context.
+
         :param browse_record carrier_file: browsable carrier.file
                                            (configuration)
         :param tuple filename: name of the file to write
-        :param tuple file_content: content of the file to write
-        :return: True if write is successful
+        :param file_content: content of the file to write, a file-like
+                             object (or a string), written by chunks
+        :return: True if write is successful. The write modes which
+                 create records for the written files can return the
+                 list of their values instead, the records of a
+                 generation run are created together at its end by
+                 _create_written_files
         """
+        written = True
+        pending_files = []
         for carrier_file in self:
+            if carrier_file.write_mode == 'fanout':
+                fanout_written, fanout_pending = \
+                    carrier_file._write_file_fanout(filename, file_content)
+                written &= fanout_written
+                pending_files += fanout_pending
+                continue
             if not carrier_file.export_path:
                 raise exceptions.Warning(
                     _('Export path is not defined '
                       'for carrier file %s') % (carrier_file.name,))
             full_path = os.path.join(carrier_file.export_path, filename)
-            with open(full_path, 'w') as file_handle:
-                file_handle.write(file_content)
+            atomic_write(full_path, file_content)
+            schedule_fsync(full_path)
+        if not written:
+            # the files written to the other destinations are kept
+            self._create_written_files(pending_files)
+            return False
+        return pending_files or True
+
+    @api.model
+    def _create_written_files(self, pending_files):
+        """
+        Create the records of the files written by a generation run,
+        as returned by _write_file.
+        Inherit in the write modes which return such values.
+
+        :param list pending_files: values returned by _write_file
+        :return: True if successful
+        """
         return True
 
+    @api.multi
+    def _write_file_fanout(self, filename, file_content):
+        """
+        Write the file to all the destinations of the configuration,
+        each one with its own write options. The destinations are
+        written in parallel threads, each one in its own transaction
+        which is rolled back.
+
+        The result of each destination is stored on it by the current
+        transaction, so it is only recorded when the transaction is
+        committed. The file is considered as written when all the
+        required destinations succeeded.
+
+        :param tuple filename: name of the file to write
+        :param file_content: content of the file to write, a file-like
+                             object (or a string)
+        :return: tuple (True if all the required destinations succeeded,
+                 values returned by the destinations to create the
+                 records of the written files)
+        """
+        self.ensure_one()
+        destinations = self.destination_ids
+        if not destinations:
+            raise exceptions.Warning(
+                _('No destination is defined '
+                  'for carrier file %s') % (self.name,))
+        if getattr(self.pool, 'test_cr', None):
+            # the threads would not see the data of the test transaction
+            errors, results = self._write_destinations_serial(
+                filename, file_content)
+        else:
+            errors, results = self._write_destinations_parallel(
+                filename, file_content)
+        now = fields.Datetime.now()
+        for destination in destinations:
+            error = errors.get(destination.target_id.id)
+            # the result is recorded whoever exports the file
+            destination.sudo().write({
+                'state': 'failed' if error else 'done',
+                'date_last_write': now,
+                'error': error or False,
+            })
+        failed = destinations.filtered(
+            lambda d: d.required and d.state == 'failed')
+        if failed:
+            _logger.warning('The file %s could not be written to: %s',
+                            filename,
+                            ', '.join(failed.mapped('target_id.name')))
+        pending_files = []
+        for result in results.itervalues():
+            if result and result is not True:
+                pending_files += result
+        return not failed, pending_files
+
+    @api.multi
+    def _write_destinations_serial(self, filename, file_content):
+        errors = {}
+        results = {}
+        for target in self.destination_ids.mapped('target_id'):
+            try:
+                with self.env.cr.savepoint():
+                    results[target.id] = target._write_file(filename,
+                                                            file_content)
+            except Exception as err:
+                _logger.exception('Could not write the file %s with the '
+                                  'carrier file %s', filename, target.name)
+                if isinstance(err, except_orm):
+                    errors[target.id] = ustr(err.value)
+                else:
+                    errors[target.id] = ustr(err)
+        return errors, results
+
+    @api.multi
+    def _write_destinations_parallel(self, filename, file_content):
+        dbname = self.env.cr.dbname
+        uid = self.env.uid
+        # the threads only get the immutable values they need, not the
+        # state of the calling transaction
+        context = {key: self.env.context[key]
+                   for key in ('lang', 'tz') if key in self.env.context}
+        picking_ids = self.env.context.get('carrier_file_picking_ids')
+        if picking_ids:
+            context['carrier_file_picking_ids'] = tuple(picking_ids)
+        errors = {}
+        results = {}
+        file_handle = open_file_content(file_content)
+        file_handle.seek(0, os.SEEK_END)
+        size = file_handle.tell()
+        file_handle.seek(0)
+        shared_file = None
+        if size > FANOUT_MAX_MEMORY_SIZE:
+            # each thread reads the temporary file with its own handle
+            shared_file = tempfile.NamedTemporaryFile()
+            shutil.copyfileobj(file_handle, shared_file, FILE_CHUNK_SIZE)
+            shared_file.flush()
+            shared_content = (shared_file.name,)
+        else:
+            shared_content = file_handle.read()
+
+        def worker(target_id):
+            error, result = _write_file_new_cursor(
+                dbname, uid, context, target_id, filename, shared_content)
+            if error:
+                errors[target_id] = error
+            else:
+                results[target_id] = result
+
+        try:
+            threads = [threading.Thread(target=worker, args=(target_id,))
+                       for target_id in self.destination_ids.mapped(
+                           'target_id').ids]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            if shared_file is not None:
+                shared_file.close()
+        return errors, results
+
+    @api.multi
+    def _compress_file(self, filename, file_content):
+        """
+        Compress the content of a file according to the compression of
+        the configuration. The content is compressed by chunks in a
+        spooled temporary file.
+
+        :param str filename: name of the file to compress
+        :param file_content: content of the file, file-like or string
+        :return: tuple with the name and the content of the compressed
+                 file, the caller is responsible of closing it
+        """
+        self.ensure_one()
+        level = min(max(self.compression_level or 6, 1), 9)
+        compressed = tempfile.SpooledTemporaryFile(
+            max_size=COMPRESSED_SPOOL_MAX_SIZE)
+        try:
+            if self.compression == 'gzip':
+                gzip_file = gzip.GzipFile(filename=filename, mode='wb',
+                                          compresslevel=level,
+                                          fileobj=compressed)
+                with closing(gzip_file):
+                    for chunk in iter_file_chunks(file_content):
+                        gzip_file.write(chunk)
+                filename = '%s.gz' % filename
+            elif self.compression == 'zip':
+                # zipfile only archives a file of the filesystem by chunks
+                # and always uses the default compression level
+                with tempfile.NamedTemporaryFile() as source:
+                    shutil.copyfileobj(open_file_content(file_content),
+                                       source, FILE_CHUNK_SIZE)
+                    source.flush()
+                    zip_file = zipfile.ZipFile(
+                        compressed, mode='w',
+                        compression=zipfile.ZIP_DEFLATED, allowZip64=True)
+                    with closing(zip_file):
+                        zip_file.write(source.name, arcname=filename)
+                filename = '%s.zip' % filename
+            else:
+                raise ValueError('Unknown compression %s' %
+                                 (self.compression,))
+            compressed.seek(0)
+        except Exception:
+            compressed.close()
+            raise
+        return filename, compressed
+
     @api.one
     def _generate_files(self, picking_ids):
         """
@@ -85,22 +462,40 @@ class CarrierFile(models.Model):
         pickings = picking_obj.browse(picking_ids)
         files = file_generator.generate_files(pickings, self)
 
-        for f in files:
-            filename, file_content, picking_ids = f
-            # we pass the errors because the files can still be
-            # generated manually
-            # at first I would like to open a new cursor and
-            # commit the write after each file created
-            # but I encountered lock because the picking
-            # was already modified in the current transaction
-            try:
-                if self._write_file(filename, file_content):
-                    picking_obj.browse(picking_ids).write({
-                        'carrier_file_generated': True})
-            except Exception as e:
-                log.exception("Could not create the picking file "
-                              "for pickings %s: %s",
-                              picking_ids, e)
+        pending_files = []
+        # the files written on the disk are synced together at the end
+        with batched_fsync():
+            for f in files:
+                filename, file_content, picking_ids = f
+                # we pass the errors because the files can still be
+                # generated manually
+                # at first I would like to open a new cursor and
+                # commit the write after each file created
+                # but I encountered lock because the picking
+                # was already modified in the current transaction
+                contents = [file_content]
+                try:
+                    if self.compression:
+                        filename, file_content = self._compress_file(
+                            filename, file_content)
+                        contents.append(file_content)
+                    writer = self.with_context(
+                        carrier_file_picking_ids=picking_ids)
+                    written = writer._write_file(filename, file_content)
+                    if written:
+                        picking_obj.browse(picking_ids).write({
+                            'carrier_file_generated': True})
+                        if written is not True:
+                            pending_files += written
+                except Exception as e:
+                    log.exception("Could not create the picking file "
+                                  "for pickings %s: %s",
+                                  picking_ids, e)
+                finally:
+                    for content in contents:
+                        if not isinstance(content, basestring):
+                            content.close()
+        self._create_written_files(pending_files)
         return True
 
     @api.one
@@ -118,6 +513,59 @@ class CarrierFile(models.Model):
         """
         return self._generate_files(picking_ids)
 
+    @api.multi
+    def _scheduled_export_domain(self):
+        """
+        Domain of the pickings to export by the scheduler: the done
+        pickings without file yet.
+        """
+        self.ensure_one()
+        return [('carrier_id.carrier_file_id', '=', self.id),
+                ('picking_type_id.code', '=', 'outgoing'),
+                ('state', '=', 'done'),
+                ('carrier_file_generated', '=', False),
+                ]
+
+    @api.multi
+    def export_scheduled(self):
+        """
+        Export the files of the done pickings not exported yet, by
+        chunks of pickings. Each chunk is committed, so an interrupted
+        export continues with the pickings still without file.
+
+        The pickings whose file failed keep no file and are retried by
+        the next run. Within a run, the chunks are read by increasing
+        id so they are not retried in a loop.
+
+        :return: True if successful
+        """
+        picking_obj = self.env['stock.picking']
+        for carrier_file in self:
+            chunk_size = (carrier_file.export_chunk_size or
+                          DEFAULT_EXPORT_CHUNK_SIZE)
+            last_id = 0
+            while True:
+                domain = carrier_file._scheduled_export_domain()
+                domain.append(('id', '>', last_id))
+                pickings = picking_obj.search(domain, order='id',
+                                              limit=chunk_size)
+                if not pickings:
+                    break
+                last_id = pickings[-1].id
+                carrier_file._generate_files(pickings.ids)
+                self.env.cr.commit()
+                if len(pickings) < chunk_size:
+                    break
+        return True
+
+    @api.model
+    def run_scheduled_exports(self):
+        """
+        Method called by the scheduler
+        """
+        carrier_files = self.search([('scheduled_export', '=', True)])
+        return carrier_files.export_scheduled()
+
     name = fields.Char('Name', size=64, required=True)
     type = fields.Selection(selection='get_type_selection',
                             string='Type', required=True)
@@ -127,15 +575,78 @@ class CarrierFile(models.Model):
                                     'Has no effect when the files '
                                     'are automatically exported at '
                                     'the delivery order process.')
+    max_rows = fields.Integer(
+        'Maximum Lines per File',
+        help='When the pickings are grouped, the file is split in '
+             'numbered files of at most this number of lines. '
+             'No limit when 0.')
+    max_bytes = fields.Integer(
+        'Maximum Size per File (bytes)',
+        help='When the pickings are grouped, the file is split in '
+             'numbered files of at most this size. No limit when 0.')
     write_mode = fields.Selection(selection='get_write_mode_selection',
                                   string='Write on', required=True)
+    destination_ids = fields.One2many(
+        comodel_name='delivery.carrier.file.destination',
+        inverse_name='carrier_file_id',
+        string='Destinations',
+        copy=True)
     export_path = fields.Char('Export Path', size=256)
+    compression = fields.Selection(
+        selection=[('gzip', 'Gzip'),
+                   ('zip', 'Zip')],
+        string='Compression',
+        help='Compress the files before writing them, whatever the '
+             'write mode.')
+    compression_level = fields.Integer(
+        'Compression Level',
+        default=6,
+        help='From 1 (fastest) to 9 (smallest). Only used by the Gzip '
+             'compression, the Zip one uses the default level.')
     auto_export = fields.Boolean('Export at delivery order process',
                                  help='The file will be automatically '
                                  'generated when a delivery order '
                                  'is processed. If activated, each '
                                  'delivery order will be exported '
                                  'in a separate file.')
+    scheduled_export = fields.Boolean(
+        'Export by the scheduler',
+        help='The files of the done delivery orders without file yet '
+             'are generated by a scheduled action, by chunks of '
+             'delivery orders.')
+    export_chunk_size = fields.Integer(
+        'Delivery Orders per Chunk',
+        default=DEFAULT_EXPORT_CHUNK_SIZE,
+        help='Number of delivery orders exported and committed '
+             'together by the scheduler.')
+
+
+class CarrierFileDestination(models.Model):
+    _name = 'delivery.carrier.file.destination'
+    _description = 'Carrier File Destination'
+
+    carrier_file_id = fields.Many2one('delivery.carrier.file',
+                                      'Carrier File',
+                                      required=True,
+                                      ondelete='cascade',
+                                      index=True)
+    target_id = fields.Many2one('delivery.carrier.file',
+                                'Write as',
+                                required=True,
+                                ondelete='restrict',
+                                domain=[('write_mode', '!=', 'fanout')],
+                                help='The file is written with the write '
+                                     'options of this configuration.')
+    required = fields.Boolean('Required', default=True,
+                              help='The delivery orders are marked as '
+                                   'generated only when all the required '
+                                   'destinations succeeded.')
+    state = fields.Selection([('done', 'Succeeded'),
+                              ('failed', 'Failed')],
+                             'Last Write', readonly=True, copy=False)
+    date_last_write = fields.Datetime('Last Write Date', readonly=True,
+                                      copy=False)
+    error = fields.Text('Last Error', readonly=True, copy=False)
 
 
 class delivery_carrier(models.Model):
@@ -1,4 +1,4 @@
-# CSV writer from python doc
+# CSV writer adapted from python doc
 import csv
 import codecs
 
@@ -7,35 +7,61 @@ try:
 except ImportError:
     import StringIO
 
+# the rows are written in the target stream by blocks of this size
+WRITE_BUFFER_SIZE = 64 * 1024
+
 
 class UnicodeWriter(object):
 
     """
     A CSV writer which will write rows to CSV file "f",
     which is encoded in the given encoding.
+
+    The cells are encoded only once, in UTF-8, and the rows given to
+    ``writerows`` are buffered then written in the target stream by
+    large blocks. The blocks are re-encoded only when the target
+    encoding is not UTF-8. A row given to ``writerow`` is written in the
+    target stream at once.
     """
 
-    def __init__(self, f, dialect=csv.excel, encoding="utf-8", **kwds):
-        # Redirect output to a queue
-        self.queue = StringIO.StringIO()
-        self.writer = csv.writer(self.queue, dialect=dialect, **kwds)
+    def __init__(self, f, dialect=csv.excel, encoding="utf-8",
+                 buffer_size=WRITE_BUFFER_SIZE, **kwds):
+        self.buffer = StringIO.StringIO()
+        self.writer = csv.writer(self.buffer, dialect=dialect, **kwds)
         self.stream = f
-        self.encoder = codecs.getincrementalencoder(encoding)()
+        self.buffer_size = buffer_size
+        if codecs.lookup(encoding).name == 'utf-8':
+            self.encoder = None
+        else:
+            self.encoder = codecs.getincrementalencoder(encoding)()
 
-    def writerow(self, row):
+    @staticmethod
+    def _encode_row(row):
         # we ensure that we do not try to encode none or bool
-        row = [x or u'' for x in row]
-        self.writer.writerow([s.encode("utf-8") for s in row])
-        # Fetch UTF-8 output from the queue ...
-        data = self.queue.getvalue()
-        data = data.decode("utf-8")
-        # ... and reencode it into the target encoding
-        data = self.encoder.encode(data)
-        # write to the target stream
-        self.stream.write(data)
-        # empty queue
-        self.queue.truncate(0)
+        return [s.encode("utf-8") if isinstance(s, unicode) else s or ''
+                for s in row]
+
+    def writerow(self, row):
+        self.writer.writerow(self._encode_row(row))
+        self.flush()
 
     def writerows(self, rows):
+        encode_row = self._encode_row
+        writerow = self.writer.writerow
+        buffer_size = self.buffer_size
         for row in rows:
-            self.writerow(row)
+            writerow(encode_row(row))
+            if self.buffer.tell() >= buffer_size:
+                self.flush()
+        self.flush()
+
+    def flush(self):
+        data = self.buffer.getvalue()
+        if not data:
+            return
+        if self.encoder is not None:
+            # re-encode the whole block into the target encoding
+            data = self.encoder.encode(data.decode("utf-8"))
+        self.stream.write(data)
+        self.buffer.seek(0)
+        self.buffer.truncate()
@@ -20,6 +20,55 @@
 ##############################################################################
 
 
+class LineLayout(type):
+
+    """
+    Metaclass of the lines, compiles the layout of a line class
+    when the class is created.
+
+    The field names become the __slots__ of the class and "_layout" holds
+    a (field name, width, zero fill) tuple for each column, so the
+    formatting of a line does not parse the definition of the fields.
+    """
+
+    def __new__(mcs, name, bases, attrs):
+        if 'fields' in attrs:
+            fields = attrs['fields']
+        else:
+            fields = next((base.fields for base in bases
+                           if hasattr(base, 'fields')), ())
+        # the class does not exist yet, take the definition of the
+        # fields from its attributes or from its bases
+        if '_field_definition' in attrs:
+            field_definition = attrs['_field_definition'].__func__
+        else:
+            field_definition = next(base._field_definition for base in bases
+                                    if hasattr(base, '_field_definition'))
+        base_field_names = set()
+        for base in bases:
+            base_field_names.update(getattr(base, '_field_names', ()))
+        field_names = []
+        for field in fields:
+            field_name = field_definition(field)[0]
+            if field_name and field_name not in field_names:
+                field_names.append(field_name)
+        attrs['__slots__'] = tuple(attrs.get('__slots__', ())) + tuple(
+            field_name for field_name in field_names
+            if field_name not in base_field_names)
+        cls = super(LineLayout, mcs).__new__(mcs, name, bases, attrs)
+        cls._field_names = tuple(field_names)
+        zerofill_fields = set()
+        if cls.fixed_width:
+            zerofill_fields.update(cls.zerofill_fields or ())
+        layout = []
+        for field in fields:
+            field_name, width = cls._field_definition(field)
+            zerofill = bool(width) and field_name in zerofill_fields
+            layout.append((field_name, width, zerofill))
+        cls._layout = tuple(layout)
+        return cls
+
+
 class BaseLine(object):
 
     """
@@ -69,23 +118,38 @@ class BaseLine(object):
     row.field2 = 'long_name'
     row.get_fields()
     => ['x', 'long']
+
+    When "fixed_width" is set, the values are also padded with spaces to
+    their width, or with zeros for the fields listed in "zerofill_fields",
+    and format_rows() returns the lines of many records at once.
+
+    class MyLine(BaseLine):
+        fixed_width = True
+        fields = (('field1', 4),
+                  ('field2', 3))
+        zerofill_fields = ['field2']
+
+    row = MyLine()
+    row.field1 = 'x'
+    row.field2 = 7
+    MyLine.format_rows([row])
+    => [u'x   007']
+
+    The layout of a class is compiled once, when the class is created,
+    and the fields are the __slots__ of the lines.
     """
+    __metaclass__ = LineLayout
+
     fields = ()
+    zerofill_fields = ()
+    fixed_width = False
 
     def __init__(self):
         """
-        Create an instance attribute for each field
-        in the fields class property
-        Unless if the field name is empty
-        (in order to leave a column empty in the row)
+        The fields not set on a line are empty in the row.
         """
         if not self.fields:
             raise ValueError("Fields Missing")
-        for field in self.fields:
-            field_name, _ = self._field_definition(field)
-            if not field_name:
-                continue
-            setattr(self, field_name, '')
 
     @staticmethod
     def _field_definition(field):
@@ -114,26 +178,42 @@ class BaseLine(object):
         generate a row with all the value of the line.
         If a width is defined on some fields,
         their content is cut to their maximal length.
+        For fixed width lines, their content is also padded to their width.
 
         :return: a list of values for each field in the
                  order of the class attribute "fields"
         """
         res = []
-        for field in self.fields:
-            field_name, width = self._field_definition(field)
-            if field_name:
-                value = getattr(self, field_name)
-                if value in (False, None):
-                    value = ''
-                elif not isinstance(value, (str, unicode)):
-                    value = unicode(value)
-                if width:
-                    value = value[0:width]
-            else:
+        fixed_width = self.fixed_width
+        for field_name, width, zerofill in self._layout:
+            if not field_name:
+                res.append('')
+                continue
+            value = getattr(self, field_name, '')
+            if value in (False, None):
                 value = ''
+            elif not isinstance(value, basestring):
+                value = unicode(value)
+            if width:
+                value = value[0:width]
+                if zerofill:
+                    value = value.zfill(width)
+                elif fixed_width:
+                    value = value.ljust(width)
             res.append(value)
         return res
 
+    @classmethod
+    def format_rows(cls, records):
+        """
+        Format many lines of the class at once, each line being the
+        concatenation of the values of its fields.
+
+        :param records: iterable of lines of the class
+        :return: a list of strings, one per line
+        """
+        return [u"".join(record.get_fields()) for record in records]
+
     def get_header(self):
         """
         Returns a list of field's names respecting
@@ -141,8 +221,4 @@ class BaseLine(object):
 
         :return: a list of field names
         """
-        res = []
-        for field in self.fields:
-            field_name, _ = self._field_definition(field)
-            res.append(field_name)
-        return res
+        return [field_name for field_name, __, __ in self._layout]
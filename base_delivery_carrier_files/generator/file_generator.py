@@ -19,16 +19,29 @@
 #
 ##############################################################################
 
+import os
 import string
 import datetime
+import itertools
+import operator
+import tempfile
 try:
     import cStringIO as StringIO
 except ImportError:
     import StringIO
 
+# the content of a file is kept in memory up to this size, then it is
+# spooled to a temporary file on the disk
+FILE_SPOOL_MAX_SIZE = 1024 * 1024
+
 
 class CarrierFileGenerator(object):
 
+    # dotted paths of the fields used by _get_rows, starting from the
+    # picking, e.g. 'partner_id.country_id.code'. They are read for all
+    # the pickings at once before the rows are generated.
+    prefetch_fields = ()
+
     def __init__(self, carrier_name):
         self.carrier_name = carrier_name
 
@@ -63,15 +76,49 @@ class CarrierFileGenerator(object):
         :param browse_record pickings: list of browsable pickings records
         :param browse_record configuration: configuration of
                                             the file to generate
-        :return: list of tuple with files to create like:
+        :return: list (or iterator when the grouped files are split
+                 in chunks) of tuple with files to create like:
                  [('filename1', file, [picking ids]),
                   ('filename2', file2, [picking ids])]
+                 where the files are file-like objects positioned at
+                 their beginning
         """
+        self._prefetch(pickings, configuration)
         if configuration.group_pickings:
             return self._generate_files_grouped(pickings, configuration)
         else:
             return self._generate_files_single(pickings, configuration)
 
+    def _prefetch(self, pickings, configuration):
+        """
+        Read the fields declared in prefetch_fields for all the pickings
+        and their related records, one read() per level of relation.
+        The values are kept in the cache of the records, so _get_rows
+        can browse them without querying the database for each picking.
+
+        :param browse_record pickings: list of browsable pickings records
+        :param browse_record configuration: configuration of
+                                            the file to generate
+        """
+        tree = {}
+        for path in self.prefetch_fields:
+            node = tree
+            for field_name in path.split('.'):
+                node = node.setdefault(field_name, {})
+        self._prefetch_tree(pickings, tree)
+
+    def _prefetch_tree(self, records, tree):
+        if not records or not tree:
+            return
+        field_names = [name for name in tree if name in records._fields]
+        if not field_names:
+            return
+        records.read(field_names, load='_classic_write')
+        for field_name in field_names:
+            if tree[field_name] and records._fields[field_name].relational:
+                self._prefetch_tree(records.mapped(field_name),
+                                    tree[field_name])
+
     def _get_filename_single(self, picking, configuration, extension='csv'):
         """
         Generate the filename for a picking when one file is
@@ -109,20 +156,37 @@ class CarrierFileGenerator(object):
                                       we generate a row in the file
         :param browse_record configuration: configuration of
                                             the file to generate
-        :return: list of rows
+        :return: iterable of rows, a list or a generator
         """
         return NotImplementedError
 
+    def _iter_rows(self, pickings, configuration):
+        """
+        Returns an iterator on the rows of all the pickings.
+        The rows of a picking are only read when the previous ones
+        have been consumed.
+
+        :param browse_record pickings: list of browsable pickings records
+        :param browse_record configuration: configuration of
+                                            the file to generate
+        :return: iterator of rows
+        """
+        return itertools.chain.from_iterable(
+            self._get_rows(picking, configuration) for picking in pickings)
+
     def _write_rows(self, file_handle, rows, configuration):
         """
         Write the rows in the file (file_handle).
         Inherit and implement in subclasses.
 
-        :param StringIO file_handle: file to write in
-        :param rows: rows to write in the file
+        The rows have to be consumed one by one and written as they
+        come, they can be a generator.
+
+        :param file file_handle: file-like object to write in
+        :param rows: iterable of rows to write in the file
         :param browse_record configuration: configuration of
                                             the file to generate
-        :return: the file_handle as StringIO with the rows written in it
+        :return: the file_handle with the rows written in it
         """
         return NotImplementedError
 
@@ -147,6 +211,32 @@ class CarrierFileGenerator(object):
             file_handle.close()
         return file_content
 
+    def _get_file_stream(self, rows, configuration):
+        """
+        Create a file in a spooled temporary file, call the method which
+        generates the content of the file and returns the file positioned
+        at its beginning. The content stays in memory for small files
+        and goes on the disk for the large ones.
+
+        The caller is responsible of closing the file.
+
+        :param rows: iterable of rows to write in the file, the way they
+                     are written to the file is defined in _write_rows
+        :param browse_record configuration: configuration of
+                                            the file to generate
+        :return: file-like object with the content of the file
+        """
+        file_handle = tempfile.SpooledTemporaryFile(
+            max_size=FILE_SPOOL_MAX_SIZE)
+        try:
+            file_handle = self._write_rows(file_handle,
+                                           rows, configuration)
+            file_handle.seek(0)
+        except Exception:
+            file_handle.close()
+            raise
+        return file_handle
+
     def _generate_files_single(self, pickings, configuration):
         """
         Base method to generate the pickings files, one file per picking
@@ -165,7 +255,7 @@ class CarrierFileGenerator(object):
             filename = self._get_filename_single(picking, configuration)
             filename = self.sanitize_filename(filename)
             rows = self._get_rows(picking, configuration)
-            file_content = self._get_file(rows, configuration)
+            file_content = self._get_file_stream(rows, configuration)
             files.append((filename, file_content, [picking.id]))
         return files
 
@@ -183,16 +273,105 @@ class CarrierFileGenerator(object):
                  [('filename1', file, [picking ids]),
                   ('filename2', file2, [picking ids])]
         """
+        if configuration.max_rows or configuration.max_bytes:
+            return self._generate_files_chunked(pickings, configuration)
         files = []
-        rows = []
         filename = self._get_filename_grouped(configuration)
         filename = self.sanitize_filename(filename)
-        for picking in pickings:
-            rows += self._get_rows(picking, configuration)
-        file_content = self._get_file(rows, configuration)
+        rows = self._iter_rows(pickings, configuration)
+        file_content = self._get_file_stream(rows, configuration)
         files.append((filename, file_content, [p.id for p in pickings]))
         return files
 
+    def _get_filename_chunk(self, configuration, number):
+        """
+        Generate the filename of a numbered chunk of the grouped file.
+        By default, the number is added to the grouped filename, before
+        its extension.
+        Inherit in subclasses when the carrier imposes its own naming.
+
+        :param browse_record configuration: configuration of
+                                            the file to generate
+        :param int number: number of the chunk, starting at 1
+        :return: a string with the name of the file
+        """
+        filename = self._get_filename_grouped(configuration)
+        root, extension = os.path.splitext(filename)
+        return "%s_%03d%s" % (root, number, extension)
+
+    def _iter_chunked_rows(self, pickings, configuration,
+                           header_rows=0, header_bytes=0):
+        """
+        Returns an iterator on the rows of the pickings, numbered by
+        chunks which do not exceed the maximum number of rows or bytes
+        of the configuration. The rows of a picking are never split
+        between two chunks, a picking bigger than the limits is alone
+        in its chunk.
+
+        :param browse_record pickings: list of browsable pickings records
+        :param browse_record configuration: configuration of
+                                            the file to generate
+        :param int header_rows: number of rows written at the beginning
+                                of each chunk, counted in the limits
+        :param int header_bytes: size of the rows written at the
+                                 beginning of each chunk
+        :return: iterator of tuples (chunk number, picking, rows of the
+                 picking, content of the rows)
+        """
+        max_rows = configuration.max_rows
+        max_bytes = configuration.max_bytes
+        number = 0
+        row_count = byte_count = 0
+        for picking in pickings:
+            rows = list(self._get_rows(picking, configuration))
+            content = self._get_file(rows, configuration)
+            if not number or (
+                    (max_rows and row_count + len(rows) > max_rows) or
+                    (max_bytes and
+                     byte_count + len(content) > max_bytes)):
+                number += 1
+                row_count = header_rows
+                byte_count = header_bytes
+            row_count += len(rows)
+            byte_count += len(content)
+            yield number, picking, rows, content
+
+    def _generate_files_chunked(self, pickings, configuration):
+        """
+        Generate the grouped files of the pickings in numbered chunks
+        which do not exceed the maximum number of rows or bytes of the
+        configuration, see _iter_chunked_rows.
+
+        The files are generated lazily: a chunk is rendered when the
+        previous one has been consumed, so it can be written before the
+        next one is generated.
+
+        :param browse_record pickings: list of browsable pickings records
+        :param browse_record configuration: configuration of
+                                            the file to generate
+        :return: iterator of tuple with files to create like:
+                 ('filename_001', file, [picking ids]),
+                 ('filename_002', file2, [picking ids])
+        """
+        chunks = itertools.groupby(
+            self._iter_chunked_rows(pickings, configuration),
+            key=operator.itemgetter(0))
+        for number, chunk in chunks:
+            filename = self._get_filename_chunk(configuration, number)
+            filename = self.sanitize_filename(filename)
+            file_handle = tempfile.SpooledTemporaryFile(
+                max_size=FILE_SPOOL_MAX_SIZE)
+            picking_ids = []
+            try:
+                for __, picking, __, content in chunk:
+                    file_handle.write(content)
+                    picking_ids.append(picking.id)
+                file_handle.seek(0)
+            except Exception:
+                file_handle.close()
+                raise
+            yield (filename, file_handle, picking_ids)
+
 
 def new_file_generator(carrier_name):
     for cls in CarrierFileGenerator.__subclasses__():
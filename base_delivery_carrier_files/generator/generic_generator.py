@@ -45,6 +45,21 @@ class GenericLine(BaseLine):
 
 class LaPosteFileGenerator(CarrierFileGenerator):
 
+    prefetch_fields = ('name',
+                       'weight',
+                       'carrier_id.name',
+                       'partner_id.name',
+                       'partner_id.street',
+                       'partner_id.street2',
+                       'partner_id.zip',
+                       'partner_id.city',
+                       'partner_id.phone',
+                       'partner_id.mobile',
+                       'partner_id.email',
+                       'partner_id.fax',
+                       'partner_id.state_id.name',
+                       'partner_id.country_id.code')
+
     @classmethod
     def carrier_for(cls, carrier_name):
         return carrier_name == 'generic'
@@ -25,6 +25,18 @@ from openerp import models, fields, api
 class stock_picking(models.Model):
     _inherit = "stock.picking"
 
+    def _auto_init(self, cr, context=None):
+        res = super(stock_picking, self)._auto_init(cr, context=context)
+        # used by the scheduled export of the carrier files
+        index_name = 'stock_picking_carrier_file_export_index'
+        cr.execute("SELECT indexname FROM pg_indexes WHERE indexname = %s",
+                   (index_name,))
+        if not cr.fetchone():
+            cr.execute("CREATE INDEX %s ON stock_picking "
+                       "(carrier_file_generated, id)" %
+                       (index_name,))
+        return res
+
     @api.multi
     def generate_carrier_files(self, auto=True,
                                recreate=False):
@@ -66,10 +78,31 @@ class stock_picking(models.Model):
             carrier_file.generate_files(carrier_file_ids[carrier_file.id])
         return True
 
+    @api.model
+    def _export_pending_carrier_files(self, picking_ids):
+        """
+        Export the carrier files of the pickings of an action_done, once
+        they are all done.
+
+        :param picking_ids: ids of the pickings having moves set as done
+        :return: True if successful
+        """
+        if not picking_ids:
+            return True
+        done_pickings = self.search([('id', 'in', list(picking_ids)),
+                                     ('state', '=', 'done')])
+        return done_pickings.generate_carrier_files(auto=True)
+
     @api.multi
     def action_done(self):
-        result = super(stock_picking, self).action_done()
-        self.generate_carrier_files(auto=True)
+        # the moves done during the call do not export their pickings,
+        # every picking is considered once at the end of the outermost
+        # action_done
+        if self.env.context.get('carrier_file_defer_export'):
+            return super(stock_picking, self).action_done()
+        pickings = self.with_context(carrier_file_defer_export=True)
+        result = super(stock_picking, pickings).action_done()
+        self._export_pending_carrier_files(self.ids)
         return result
 
     carrier_file_generated = fields.Boolean(
@@ -80,11 +113,24 @@ class stock_picking(models.Model):
 class stock_move(models.Model):
     _inherit = 'stock.move'
 
+    @api.multi
+    def action_done(self):
+        if self.env.context.get('carrier_file_defer_export'):
+            return super(stock_move, self).action_done()
+        moves = self.with_context(carrier_file_defer_export=True)
+        result = super(stock_move, moves).action_done()
+        self.env['stock.picking']._export_pending_carrier_files(
+            self.mapped('picking_id').ids)
+        return result
+
     @api.multi
     def write(self, values):
         write_result = super(stock_move, self).write(values)
         if values.get('state') and values['state'] == 'done':
-            picking_ids = map(lambda p: p.id, self.mapped('picking_id'))
+            if self.env.context.get('carrier_file_defer_export'):
+                # exported at the end of the action_done
+                return write_result
+            picking_ids = self.mapped('picking_id').ids
             done_pickings = self.env['stock.picking'].search([
                 ('id', 'in', picking_ids),
                 ('state', '=', 'done')
@@ -0,0 +1,5 @@
+from . import test_file_generator
+from . import test_carrier_file
+from . import test_unicode_writer
+from . import test_stock
+from . import test_atomic_write
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import stat
+import tempfile
+
+import mock
+import unittest2
+
+from .. import carrier_file
+from ..carrier_file import atomic_write, batched_fsync, schedule_fsync
+
+
+class FailingFile(object):
+    """File-like object failing after its first chunk."""
+
+    def __init__(self):
+        self.chunks = ['partial content']
+
+    def seek(self, offset):
+        pass
+
+    def read(self, size):
+        if not self.chunks:
+            raise IOError('read error')
+        return self.chunks.pop()
+
+
+class TestAtomicWrite(unittest2.TestCase):
+    """Test the files written on the disk."""
+
+    def setUp(self):
+        super(TestAtomicWrite, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, 'export.csv')
+
+    def test_file_mode(self):
+        """The file follows the umask, as a file created by open()."""
+        umask = os.umask(0)
+        os.umask(umask)
+        atomic_write(self.path, 'content')
+        mode = stat.S_IMODE(os.stat(self.path).st_mode)
+        self.assertEqual(mode, 0o666 & ~umask)
+        with open(self.path) as handle:
+            self.assertEqual(handle.read(), 'content')
+        self.assertEqual(os.listdir(self.directory), ['export.csv'])
+
+    def test_replace(self):
+        """An existing file is replaced."""
+        atomic_write(self.path, 'old content')
+        atomic_write(self.path, 'new content')
+        with open(self.path) as handle:
+            self.assertEqual(handle.read(), 'new content')
+        self.assertEqual(os.listdir(self.directory), ['export.csv'])
+
+    def test_error(self):
+        """A failed write keeps the previous file and no temporary file."""
+        atomic_write(self.path, 'old content')
+        with self.assertRaises(IOError):
+            atomic_write(self.path, FailingFile())
+        with open(self.path) as handle:
+            self.assertEqual(handle.read(), 'old content')
+        self.assertEqual(os.listdir(self.directory), ['export.csv'])
+
+
+class TestBatchedFsync(unittest2.TestCase):
+    """Test the files synced at the end of the generation runs."""
+
+    def test_batched(self):
+        """The files of nested runs are synced at the end of the outer."""
+        with mock.patch.object(carrier_file, '_fsync_paths') as fsync_paths:
+            with batched_fsync():
+                schedule_fsync('/tmp/a')
+                with batched_fsync():
+                    schedule_fsync('/tmp/b')
+                self.assertFalse(fsync_paths.called)
+            fsync_paths.assert_called_once_with(['/tmp/a', '/tmp/b'])
+
+    def test_batched_error(self):
+        """The files written before an error are synced as well."""
+        with mock.patch.object(carrier_file, '_fsync_paths') as fsync_paths:
+            with self.assertRaises(ValueError):
+                with batched_fsync():
+                    schedule_fsync('/tmp/a')
+                    raise ValueError
+            fsync_paths.assert_called_once_with(['/tmp/a'])
+
+    def test_outside_run(self):
+        """A file written outside a run is synced at once."""
+        with mock.patch.object(carrier_file, '_fsync_paths') as fsync_paths:
+            schedule_fsync('/tmp/a')
+            fsync_paths.assert_called_once_with(['/tmp/a'])
+
+    def test_fsync_paths(self):
+        """The directory of several files is synced once."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        paths = [os.path.join(directory, name) for name in ('a', 'b')]
+        for path in paths:
+            atomic_write(path, 'content')
+        with mock.patch.object(carrier_file.os, 'fsync') as fsync:
+            carrier_file._fsync_paths(paths)
+        self.assertEqual(fsync.call_count, 3)
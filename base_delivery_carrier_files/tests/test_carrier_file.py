@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+
+import gzip
+import os
+import shutil
+import tempfile
+import threading
+import zipfile
+
+import mock
+
+from openerp.tests.common import TransactionCase
+
+
+class SharedCursor(object):
+    """Cursor of a writing thread running in the test transaction.
+
+    The threads use the cursor one at a time, their transactions are
+    emulated with a savepoint.
+    """
+
+    def __init__(self, cr, lock):
+        self._cr = cr
+        self._lock = lock
+        self._lock.acquire()
+        self._cr.execute('SAVEPOINT carrier_file_thread')
+
+    def __getattr__(self, name):
+        return getattr(self._cr, name)
+
+    def commit(self):
+        self._cr.execute('RELEASE SAVEPOINT carrier_file_thread')
+        self._cr.execute('SAVEPOINT carrier_file_thread')
+
+    def rollback(self):
+        self._cr.execute('ROLLBACK TO SAVEPOINT carrier_file_thread')
+
+    def close(self):
+        self._cr.execute('RELEASE SAVEPOINT carrier_file_thread')
+        self._lock.release()
+
+
+class TestCarrierFile(TransactionCase):
+    """Test the writing of the carrier files."""
+
+    def _create_carrier_file(self, **values):
+        vals = {'name': 'Test carrier file',
+                'type': 'generic',
+                'write_mode': 'disk',
+                }
+        vals.update(values)
+        return self.env['delivery.carrier.file'].create(vals)
+
+    def _shared_cursor_threads(self):
+        """Run the threads of the fanout in the test transaction."""
+        lock = threading.Lock()
+        registry = mock.Mock()
+        registry.cursor.side_effect = lambda: SharedCursor(self.cr, lock)
+        patcher = mock.patch('openerp.addons.base_delivery_carrier_files.'
+                             'carrier_file.RegistryManager')
+        registry_manager = patcher.start()
+        self.addCleanup(patcher.stop)
+        registry_manager.get.return_value = registry
+
+    def setUp(self):
+        super(TestCarrierFile, self).setUp()
+        self.export_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.export_path)
+        self.user = self.env['res.users'].create({
+            'name': 'Test salesman',
+            'login': 'test_carrier_file_salesman',
+            'groups_id': [(6, 0, [self.env.ref('base.group_sale_salesman').id,
+                                  self.env.ref('stock.group_stock_user').id])],
+        })
+
+    def test_compress_gzip(self):
+        """The gzip file keeps the whole name of the file."""
+        carrier_file = self._create_carrier_file(compression='gzip')
+        filename, compressed = carrier_file._compress_file(
+            'export_20260101.0001', 'content')
+        with gzip.GzipFile(fileobj=compressed) as gzip_file:
+            self.assertEqual(gzip_file.read(), 'content')
+        compressed.close()
+        self.assertEqual(filename, 'export_20260101.0001.gz')
+
+    def test_compress_zip(self):
+        """Files differing by their extension get distinct zip files."""
+        carrier_file = self._create_carrier_file(compression='zip')
+        for name in ('export_20260101.0001', 'export_20260101.0002'):
+            filename, compressed = carrier_file._compress_file(name,
+                                                               'content')
+            self.assertEqual(filename, '%s.zip' % name)
+            with zipfile.ZipFile(compressed) as zip_file:
+                self.assertEqual(zip_file.namelist(), [name])
+                self.assertEqual(zip_file.read(name), 'content')
+            compressed.close()
+
+    def test_fanout(self):
+        """The results of the destinations are recorded for any user.
+
+        The file is written when the failed destinations are optional.
+        """
+        self._shared_cursor_threads()
+        disk = self._create_carrier_file(export_path=self.export_path)
+        # no export path
+        broken = self._create_carrier_file()
+        fanout = self._create_carrier_file(
+            write_mode='fanout',
+            destination_ids=[(0, 0, {'target_id': disk.id}),
+                             (0, 0, {'target_id': broken.id,
+                                     'required': False})])
+        written = fanout.sudo(self.user)._write_file('export.txt', 'content')
+        self.assertIs(written, True)
+        with open(os.path.join(self.export_path, 'export.txt')) as handle:
+            self.assertEqual(handle.read(), 'content')
+        done, failed = fanout.destination_ids
+        self.assertEqual(done.state, 'done')
+        self.assertFalse(done.error)
+        self.assertEqual(failed.state, 'failed')
+        self.assertIn('Export path is not defined', failed.error)
+        self.assertTrue(failed.date_last_write)
+
+    def test_fanout_required_failed(self):
+        """The file is not written when a required destination failed."""
+        self._shared_cursor_threads()
+        disk = self._create_carrier_file(export_path=self.export_path)
+        broken = self._create_carrier_file()
+        fanout = self._create_carrier_file(
+            write_mode='fanout',
+            destination_ids=[(0, 0, {'target_id': disk.id}),
+                             (0, 0, {'target_id': broken.id})])
+        written = fanout.sudo(self.user)._write_file('export.txt', 'content')
+        self.assertIs(written, False)
+        self.assertEqual(fanout.destination_ids.mapped('state'),
+                         ['done', 'failed'])
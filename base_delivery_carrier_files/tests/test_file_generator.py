@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+
+import tempfile
+
+import mock
+import unittest2
+
+from ..generator import CarrierFileGenerator
+from ..generator import file_generator
+
+
+class LineGenerator(CarrierFileGenerator):
+
+    def _get_rows(self, picking, configuration):
+        return [[picking.name]] * picking.line_count
+
+    def _write_rows(self, file_handle, rows, configuration):
+        for row in rows:
+            file_handle.write("%s\n" % row[0])
+        return file_handle
+
+
+class TestChunkedFiles(unittest2.TestCase):
+    """Test the split of the grouped files in chunks."""
+
+    def setUp(self):
+        super(TestChunkedFiles, self).setUp()
+        self.generator = LineGenerator('test')
+        self.pickings = []
+        for picking_id, line_count in ((1, 1), (2, 1), (3, 3), (4, 1)):
+            picking = mock.Mock(id=picking_id, line_count=line_count)
+            picking.name = 'OUT%d' % picking_id
+            self.pickings.append(picking)
+
+    def _generate(self, configuration):
+        files = self.generator._generate_files_chunked(self.pickings,
+                                                       configuration)
+        result = []
+        for filename, file_handle, picking_ids in files:
+            result.append((filename, file_handle.read(), picking_ids))
+            file_handle.close()
+        return result
+
+    def test_max_rows(self):
+        """A picking bigger than the limit is alone in its chunk."""
+        configuration = mock.Mock(max_rows=2, max_bytes=0)
+        files = self._generate(configuration)
+        self.assertEqual([picking_ids for __, __, picking_ids in files],
+                         [[1, 2], [3], [4]])
+        self.assertEqual(files[1][1], 'OUT3\nOUT3\nOUT3\n')
+
+    def test_max_bytes(self):
+        """The chunks do not exceed the size limit."""
+        configuration = mock.Mock(max_rows=0, max_bytes=12)
+        files = self._generate(configuration)
+        self.assertEqual([picking_ids for __, __, picking_ids in files],
+                         [[1, 2], [3], [4]])
+
+    def test_chunk_filename(self):
+        """The number of the chunk is put before the extension."""
+        configuration = mock.Mock(max_rows=2, max_bytes=0)
+        files = self._generate(configuration)
+        for number, (filename, __, __) in enumerate(files, 1):
+            self.assertTrue(filename.startswith('out_'))
+            self.assertTrue(filename.endswith('_%03d.csv' % number))
+
+
+class TestStreamedFiles(unittest2.TestCase):
+    """Test the files streamed in spooled temporary files."""
+
+    def setUp(self):
+        super(TestStreamedFiles, self).setUp()
+        self.generator = LineGenerator('test')
+        self.configuration = mock.Mock(group_pickings=True, max_rows=0,
+                                       max_bytes=0)
+        self.pickings = []
+        for picking_id in (1, 2):
+            picking = mock.Mock(id=picking_id, line_count=2)
+            picking.name = 'OUT%d' % picking_id
+            self.pickings.append(picking)
+
+    def test_rows_read_lazily(self):
+        """The rows of a picking are read once the previous are written."""
+        calls = []
+        get_rows = self.generator._get_rows
+
+        def _get_rows(picking, configuration):
+            calls.append(picking.id)
+            return get_rows(picking, configuration)
+
+        self.generator._get_rows = _get_rows
+        rows = self.generator._iter_rows(self.pickings, self.configuration)
+        self.assertEqual(calls, [])
+        next(rows)
+        self.assertEqual(calls, [1])
+        self.assertEqual(list(rows), [['OUT1'], ['OUT2'], ['OUT2']])
+        self.assertEqual(calls, [1, 2])
+
+    def test_grouped_file(self):
+        """The grouped file is a spooled file at its beginning."""
+        files = self.generator.generate_files(self.pickings,
+                                              self.configuration)
+        self.assertEqual(len(files), 1)
+        __, file_handle, picking_ids = files[0]
+        self.assertIsInstance(file_handle, tempfile.SpooledTemporaryFile)
+        self.assertEqual(file_handle.read(), 'OUT1\nOUT1\nOUT2\nOUT2\n')
+        self.assertEqual(picking_ids, [1, 2])
+        file_handle.close()
+
+    def test_single_files(self):
+        """Each picking gets its own spooled file."""
+        self.configuration.group_pickings = False
+        files = self.generator.generate_files(self.pickings,
+                                              self.configuration)
+        self.assertEqual([picking_ids for __, __, picking_ids in files],
+                         [[1], [2]])
+        for (__, file_handle, __), picking in zip(files, self.pickings):
+            self.assertEqual(file_handle.read(), '%s\n' % picking.name * 2)
+            file_handle.close()
+
+    def test_large_file_on_disk(self):
+        """A file bigger than the spool size goes on the disk."""
+        with mock.patch.object(file_generator, 'FILE_SPOOL_MAX_SIZE', 8):
+            files = self.generator.generate_files(self.pickings,
+                                                  self.configuration)
+        file_handle = files[0][1]
+        self.assertTrue(file_handle._rolled)
+        self.assertEqual(file_handle.read(), 'OUT1\nOUT1\nOUT2\nOUT2\n')
+        file_handle.close()
+
+
+class TestPrefetch(unittest2.TestCase):
+    """Test the prefetch of the fields used by the rows."""
+
+    def _records(self, fields, children=None):
+        records = mock.MagicMock()
+        records.__nonzero__.return_value = True
+        records._fields = dict(
+            (name, mock.Mock(relational=name in (children or {})))
+            for name in fields)
+        records.mapped.side_effect = lambda name: children[name]
+        return records
+
+    def test_prefetch(self):
+        """The fields are read once per level of relation."""
+        countries = self._records(['code'])
+        partners = self._records(['name', 'country_id'],
+                                 {'country_id': countries})
+        pickings = self._records(['name', 'partner_id'],
+                                 {'partner_id': partners})
+        generator = LineGenerator('test')
+        generator.prefetch_fields = ('name',
+                                     'partner_id.name',
+                                     'partner_id.country_id.code',
+                                     'unknown_field')
+        generator._prefetch(pickings, mock.Mock())
+        read_fields = []
+        for records in (pickings, partners, countries):
+            self.assertEqual(records.read.call_count, 1)
+            args, kwargs = records.read.call_args
+            self.assertEqual(kwargs, {'load': '_classic_write'})
+            read_fields.append(sorted(args[0]))
+        self.assertEqual(read_fields, [['name', 'partner_id'],
+                                       ['country_id', 'name'],
+                                       ['code']])
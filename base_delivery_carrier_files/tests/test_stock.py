@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+
+import mock
+
+from openerp.tests.common import TransactionCase
+
+
+class TestCarrierFileExport(TransactionCase):
+    """Test the export of the carrier files of the done pickings."""
+
+    def _create_picking(self, carrier=None, incoming=False):
+        if incoming:
+            picking_type = self.env.ref('stock.picking_type_in')
+            location = self.env.ref('stock.stock_location_suppliers')
+            location_dest = self.env.ref('stock.stock_location_stock')
+        else:
+            picking_type = self.env.ref('stock.picking_type_out')
+            location = self.env.ref('stock.stock_location_stock')
+            location_dest = self.env.ref('stock.stock_location_customers')
+        picking = self.env['stock.picking'].create({
+            'partner_id': self.env.ref('base.res_partner_12').id,
+            'picking_type_id': picking_type.id,
+            'carrier_id': (carrier or self.carrier).id,
+        })
+        self.env['stock.move'].create({
+            'name': self.product.name,
+            'picking_id': picking.id,
+            'product_id': self.product.id,
+            'product_uom': self.product.uom_id.id,
+            'product_uom_qty': 1,
+            'location_id': location.id,
+            'location_dest_id': location_dest.id,
+        })
+        picking.action_confirm()
+        picking.force_assign()
+        return picking
+
+    def _patch_export(self):
+        """Record the pickings of each export."""
+        exports = []
+
+        def generate_carrier_files(pickings, auto=True, recreate=False):
+            exports.append(sorted(pickings.ids))
+            return True
+
+        patcher = mock.patch.object(
+            type(self.env['stock.picking']), 'generate_carrier_files',
+            autospec=True, side_effect=generate_carrier_files)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return exports
+
+    def setUp(self):
+        super(TestCarrierFileExport, self).setUp()
+        self.product = self.env.ref('product.product_product_9')
+        self.carrier_file = self.env['delivery.carrier.file'].create({
+            'name': 'Test carrier file',
+            'type': 'generic',
+            'write_mode': 'disk',
+            'auto_export': True,
+        })
+        self.carrier = self.env['delivery.carrier'].create({
+            'name': 'Test carrier',
+            'partner_id': self.env.ref('base.res_partner_12').id,
+            'product_id': self.env.ref('product.product_product_1').id,
+            'carrier_file_id': self.carrier_file.id,
+        })
+
+    def test_picking_action_done(self):
+        """The nested action_done of the moves export nothing."""
+        picking = self._create_picking()
+        exports = self._patch_export()
+        picking.action_done()
+        self.assertEqual(picking.state, 'done')
+        self.assertEqual(exports, [[picking.id]])
+
+    def test_move_action_done(self):
+        """The pickings of the moves are exported together."""
+        pickings = self._create_picking() | self._create_picking()
+        exports = self._patch_export()
+        pickings.mapped('move_lines').action_done()
+        self.assertEqual(pickings.mapped('state'), ['done', 'done'])
+        self.assertEqual(exports, [sorted(pickings.ids)])
+
+    def test_export_scheduled(self):
+        """Only the done outgoing pickings without file are exported.
+
+        Each chunk of pickings is committed.
+        """
+        carrier_file = self.env['delivery.carrier.file'].create({
+            'name': 'Test scheduled carrier file',
+            'type': 'generic',
+            'write_mode': 'disk',
+            'scheduled_export': True,
+            'export_chunk_size': 1,
+        })
+        carrier = self.carrier.copy({'carrier_file_id': carrier_file.id})
+        to_export = self._create_picking(carrier=carrier)
+        to_export |= self._create_picking(carrier=carrier)
+        generated = self._create_picking(carrier=carrier)
+        incoming = self._create_picking(carrier=carrier, incoming=True)
+        (to_export | generated | incoming).action_done()
+        generated.carrier_file_generated = True
+        # not done
+        self._create_picking(carrier=carrier)
+        # another carrier file
+        self._create_picking().action_done()
+        exports = []
+
+        def _generate_files(carrier_files, picking_ids):
+            exports.append((carrier_files.ids, picking_ids))
+            return True
+
+        carrier_file_class = type(self.env['delivery.carrier.file'])
+        with mock.patch.object(carrier_file_class, '_generate_files',
+                               autospec=True,
+                               side_effect=_generate_files), \
+                mock.patch.object(self.env.cr, 'commit') as commit:
+            carrier_file.export_scheduled()
+        self.assertEqual(exports, [([carrier_file.id], [picking_id])
+                                   for picking_id in sorted(to_export.ids)])
+        self.assertEqual(commit.call_count, 2)
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+
+try:
+    import cStringIO as StringIO
+except ImportError:
+    import StringIO
+
+import mock
+import unittest2
+
+from ..csv_writer import UnicodeWriter
+
+
+class TestUnicodeWriter(unittest2.TestCase):
+    """Test the buffered CSV writer."""
+
+    rows = [[u'Zürich', 1, None], [u'Genève', False, 'plain']]
+    expected = u'Zürich,1,\r\nGenève,,plain\r\n'
+
+    def test_writerows_utf8(self):
+        """The cells are encoded in UTF-8, empty values are blank."""
+        stream = StringIO.StringIO()
+        UnicodeWriter(stream).writerows(self.rows)
+        self.assertEqual(stream.getvalue(), self.expected.encode('utf-8'))
+
+    def test_writerows_other_encoding(self):
+        """The blocks are re-encoded in the target encoding."""
+        stream = StringIO.StringIO()
+        UnicodeWriter(stream, encoding='latin-1').writerows(self.rows)
+        self.assertEqual(stream.getvalue(), self.expected.encode('latin-1'))
+
+    def test_writerows_blocks(self):
+        """The buffer is written in the stream when it is full."""
+        stream = mock.Mock()
+        writer = UnicodeWriter(stream, buffer_size=10)
+        writer.writerows(self.rows * 2)
+        blocks = [call[0][0] for call in stream.write.call_args_list]
+        # one block per row, each one bigger than the buffer
+        self.assertEqual(len(blocks), 4)
+        self.assertEqual(''.join(blocks), self.expected.encode('utf-8') * 2)
+
+    def test_writerows_generator(self):
+        """The rows can be a generator, consumed in one pass."""
+        stream = StringIO.StringIO()
+        UnicodeWriter(stream).writerows(row for row in self.rows)
+        self.assertEqual(stream.getvalue(), self.expected.encode('utf-8'))
+
+    def test_writerow(self):
+        """A single row is written in the stream at once."""
+        stream = StringIO.StringIO()
+        writer = UnicodeWriter(stream, encoding='latin-1')
+        writer.writerow(self.rows[0])
+        self.assertEqual(stream.getvalue(),
+                         u'Zürich,1,\r\n'.encode('latin-1'))
+        writer.writerow(self.rows[1])
+        self.assertEqual(stream.getvalue(), self.expected.encode('latin-1'))
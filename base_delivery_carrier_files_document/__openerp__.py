@@ -32,6 +32,7 @@ Base Delivery Carrier Files are installed.
     'license': 'AGPL-3',
     'website': 'http://www.camptocamp.com',
     'depends': ['base_delivery_carrier_files',
+                'base_delivery_carrier_filestore',
                 'document'],
     'data': ['carrier_file_view.xml'],
     'demo': ['carrier_file_demo.xml'],
@@ -21,52 +21,100 @@
 
 import base64
 
-from openerp.osv import orm, fields
+from openerp import models, fields, api
+from openerp.addons.base_delivery_carrier_files.carrier_file import (
+    iter_file_chunks)
 
+# multiple of 57 bytes so the chunks encoded by base64.encodestring
+# (76 chars per line) can be concatenated
+BASE64_CHUNK_SIZE = 57 * 1024
 
-class CarrierFile(orm.Model):
+
+class CarrierFile(models.Model):
     _inherit = 'delivery.carrier.file'
 
-    def get_write_mode_selection(self, cr, uid, context=None):
-        res = super(CarrierFile, self).\
-            get_write_mode_selection(cr, uid, context=context)
-        if 'document' not in res:
+    @api.model
+    def get_write_mode_selection(self):
+        res = super(CarrierFile, self).get_write_mode_selection()
+        if 'document' not in [mode for mode, __ in res]:
             res.append(('document', 'Document'))
         return res
 
-    _columns = {
-        'write_mode': fields.selection(get_write_mode_selection, 'Write on',
-                                       required=True),
-        'document_directory_id': fields.many2one('document.directory',
-                                                 'Document Directory'),
-        'export_path': fields.char('Export Path', size=256),
-    }
+    write_mode = fields.Selection(get_write_mode_selection, 'Write on',
+                                  required=True)
+    document_directory_id = fields.Many2one('document.directory',
+                                            'Document Directory')
 
-    def _prepare_attachment(self, carrier_file, filename, file_content,
-                            context):
-        if carrier_file.auto_export:
-            assert context is not None and 'picking_id' in context, \
-                ('When carrier_file is in mode auto_export, picking_id must '
-                 'be in context')
-            res_id = context['picking_id']
-        else:
-            res_id = False
-        return {'name': "%s_%s" % (carrier_file.name, filename),
+    @api.model
+    def _store_file(self, file_content):
+        """ Stream the content of a file in the filestore
+
+        :return: tuple (store_fname, file_size)
+        """
+        fname, file_size, __ = self.env['ir.attachment']._store_file_content(
+            iter_file_chunks(file_content))
+        return fname, file_size
+
+    @api.multi
+    def _prepare_attachment(self, filename, picking_id):
+        self.ensure_one()
+        return {'name': "%s_%s" % (self.name, filename),
                 'datas_fname': filename,
-                'datas': base64.encodestring(file_content),
-                'parent_id': carrier_file.document_directory_id.id,
+                'parent_id': self.document_directory_id.id,
                 'type': 'binary',
-                'res_model': 'stock.picking.out',
-                'res_id': res_id}
+                'res_model': 'stock.picking' if picking_id else False,
+                'res_id': picking_id or False}
+
+    @api.model
+    def _create_attachments(self, pending_files):
+        """ Create the attachments of the files written by a generation run
+
+        :param pending_files: list of tuples (carrier file id, filename,
+                              stored file or base64 content, picking ids)
+        :return: the created attachments
+        """
+        context = self.env.context.copy()
+        # remove default_type setted for stock_picking
+        # as it would try to define default value of attachement
+        context.pop('default_type', None)
+        attachment_obj = self.env['ir.attachment'].with_context(context)
+        attachments = attachment_obj.browse()
+        stored_files = []
+        for carrier_file_id, filename, content, picking_ids in pending_files:
+            carrier_file = self.browse(carrier_file_id)
+            for picking_id in picking_ids or [False]:
+                vals = carrier_file._prepare_attachment(filename, picking_id)
+                if isinstance(content, basestring):
+                    vals['datas'] = content
+                attachment = attachment_obj.create(vals)
+                attachments |= attachment
+                if not isinstance(content, basestring):
+                    stored_files.append(content + (attachment.id,))
+        attachment_obj._write_stored_files(stored_files)
+        return attachments
+
+    @api.model
+    def _create_written_files(self, pending_files):
+        """ The attachments of the files written during the run are
+        created all together at its end
+        """
+        self._create_attachments(pending_files)
+        return super(CarrierFile, self)._create_written_files(
+            pending_files)
 
-    def _write_file(self, cr, uid, carrier_file, filename, file_content,
-                    context=None):
-        if carrier_file.write_mode == 'document':
-            vals = self._prepare_attachment(carrier_file, filename,
-                                            file_content, context=context)
-            self.pool['ir.attachment'].create(cr, uid, vals, context=context)
-            return True
+    @api.multi
+    def _write_file(self, filename, file_content):
+        if self.write_mode != 'document':
+            return super(CarrierFile, self)._write_file(filename,
+                                                        file_content)
+        if self.env['ir.attachment']._storage() == 'file':
+            content = self._store_file(file_content)
         else:
-            return (super(CarrierFile, self)
-                    ._write_file(cr, uid, carrier_file, filename, file_content,
-                                 context=context))
+            content = ''.join(
+                base64.encodestring(chunk) for chunk in
+                iter_file_chunks(file_content,
+                                 chunk_size=BASE64_CHUNK_SIZE))
+        picking_ids = self.env.context.get('carrier_file_picking_ids')
+        # the attachment is created by _create_written_files at the end
+        # of the generation run
+        return [(self.id, filename, content, picking_ids)]
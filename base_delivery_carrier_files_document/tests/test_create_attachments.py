@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+
+from openerp.tests.common import TransactionCase
+
+
+class TestCreateAttachments(TransactionCase):
+    """Test the attachments of the files written by a generation run."""
+
+    def _create_picking(self):
+        return self.env['stock.picking'].create({
+            'partner_id': self.env.ref('base.res_partner_12').id,
+            'picking_type_id': self.env.ref('stock.picking_type_out').id,
+        })
+
+    def setUp(self):
+        super(TestCreateAttachments, self).setUp()
+        self.carrier_file = self.env['delivery.carrier.file'].create({
+            'name': 'Test document',
+            'type': 'generic',
+            'write_mode': 'document',
+        })
+        self.content = 'content of the file\n' * 5000
+
+    def test_create_attachments(self):
+        """The stored and encoded files get one attachment per picking."""
+        pickings = self._create_picking() | self._create_picking()
+        stored = self.carrier_file._store_file(self.content)
+        attachments = self.carrier_file._create_attachments([
+            (self.carrier_file.id, 'stored.txt', stored, pickings.ids),
+            (self.carrier_file.id, 'encoded.txt',
+             self.content.encode('base64'), None),
+        ])
+        self.assertEqual(len(attachments), 3)
+        stored_attachments = attachments[:2]
+        self.assertEqual(stored_attachments.mapped('res_id'), pickings.ids)
+        for attachment in stored_attachments:
+            self.assertEqual(attachment.datas_fname, 'stored.txt')
+            self.assertEqual(attachment.store_fname, stored[0])
+            self.assertEqual(attachment.file_size, len(self.content))
+            self.assertEqual(attachment.datas.decode('base64'), self.content)
+        encoded = attachments[2]
+        self.assertEqual(encoded.datas_fname, 'encoded.txt')
+        self.assertFalse(encoded.res_id)
+        self.assertEqual(encoded.datas.decode('base64'), self.content)
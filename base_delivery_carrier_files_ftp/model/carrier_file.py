@@ -19,9 +19,30 @@
 #    along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
 ##############################################################################
-import tempfile
-from ftplib import FTP
+import logging
+import threading
+import time
+from ftplib import FTP, all_errors
 from openerp import models, api, fields, exceptions, _
+from openerp.addons.base_delivery_carrier_files.carrier_file import (
+    FILE_CHUNK_SIZE, open_file_content)
+
+_logger = logging.getLogger(__name__)
+
+# an idle session is checked with a NOOP before being reused
+FTP_NOOP_INTERVAL = 30
+
+# sessions opened during the generation runs of the current thread
+_ftp_local = threading.local()
+
+
+def _ftp_pool():
+    if not hasattr(_ftp_local, 'sessions'):
+        # {key: [ftp session, time of last use]}
+        _ftp_local.sessions = {}
+        # {key: number of generation runs in progress}
+        _ftp_local.runs = {}
+    return _ftp_local
 
 
 class CarrierFile(models.Model):
@@ -40,32 +61,112 @@ class CarrierFile(models.Model):
     ftp_password = fields.Char('FTP Password')
     ftp_path = fields.Char('FTP Path')
 
+    @api.multi
+    def _ftp_session_key(self):
+        self.ensure_one()
+        return (self.env.cr.dbname, self.id)
+
+    @api.multi
+    def _ftp_connect(self):
+        self.ensure_one()
+        ftp_user = self.ftp_user or 'anonymous'
+        ftp_password = self.ftp_password or 'anonymous@'
+        try:
+            ftp = FTP(self.ftp_host, ftp_user, ftp_password)
+        except Exception as e:
+            raise exceptions.Warning(_(
+                'Failed to connect/login to FTP: {}').format(e))
+        if self.ftp_path:
+            try:
+                ftp.cwd(self.ftp_path)
+            except Exception as e:
+                ftp.close()
+                raise exceptions.Warning(_(
+                    'Problem setting the current directory on FTP: {}').
+                    format(e))
+        return ftp
+
+    @api.multi
+    def _get_ftp_session(self):
+        """ Return an authenticated FTP session
+
+        During a generation run, the session is kept open and reused for
+        all the files of the configuration. A session idle for a while is
+        checked with a NOOP and opened again when it has been dropped.
+
+        """
+        self.ensure_one()
+        pool = _ftp_pool()
+        key = self._ftp_session_key()
+        session = pool.sessions.get(key)
+        if session is not None:
+            ftp, last_use = session
+            if time.time() - last_use < FTP_NOOP_INTERVAL:
+                return ftp
+            try:
+                ftp.voidcmd('NOOP')
+            except all_errors:
+                _logger.debug('FTP session of %s dropped, reconnecting',
+                              self.name)
+                self._close_ftp_session()
+            else:
+                session[1] = time.time()
+                return ftp
+        ftp = self._ftp_connect()
+        if pool.runs.get(key):
+            pool.sessions[key] = [ftp, time.time()]
+        return ftp
+
+    @api.multi
+    def _close_ftp_session(self, ftp=None):
+        pool = _ftp_pool()
+        for carrier_file in self:
+            session = pool.sessions.pop(carrier_file._ftp_session_key(),
+                                        None)
+            if session is not None:
+                ftp = session[0]
+            if ftp is None:
+                continue
+            try:
+                ftp.quit()
+            except all_errors:
+                ftp.close()
+
+    @api.multi
+    def _generate_files(self, picking_ids):
+        pool = _ftp_pool()
+        keys = [carrier_file._ftp_session_key() for carrier_file in self
+                if carrier_file.write_mode == 'ftp']
+        for key in keys:
+            pool.runs[key] = pool.runs.get(key, 0) + 1
+        try:
+            return super(CarrierFile, self)._generate_files(picking_ids)
+        finally:
+            for key in keys:
+                pool.runs[key] -= 1
+                if not pool.runs[key]:
+                    del pool.runs[key]
+            self.filtered(
+                lambda c: c._ftp_session_key() not in pool.runs
+            )._close_ftp_session()
+
     @api.multi
     def _write_file(self, filename, file_content):
         if self.write_mode == 'ftp':
-            ftp_user = self.ftp_user or 'anonymous'
-            ftp_password = self.ftp_password or 'anonymous@'
+            ftp = self._get_ftp_session()
+            ftp_command = "STOR {}".format(filename)
+            file_handle = open_file_content(file_content)
             try:
-                ftp = FTP(self.ftp_host, ftp_user, ftp_password)
+                ftp.storbinary(ftp_command, file_handle,
+                               blocksize=FILE_CHUNK_SIZE)
             except Exception as e:
+                # the session may be broken, it is not reused
+                self._close_ftp_session(ftp=ftp)
                 raise exceptions.Warning(_(
-                    'Failed to connect/login to FTP: {}').format(e))
-            if self.ftp_path:
-                try:
-                    ftp.cwd(self.ftp_path)
-                except Exception as e:
-                    raise exceptions.Warning(_(
-                        'Problem setting the current directory on FTP: {}').
-                        format(e))
-            ftp_command = "STOR {}".format(filename)
-            with tempfile.NamedTemporaryFile() as temp:
-                temp.write(file_content)
-                temp.flush()
-                with open(temp.name) as file_handle:
-                    try:
-                        ftp.storbinary(ftp_command, file_handle)
-                    except Exception as e:
-                        raise exceptions.Warning(_(
-                            'Problem uploading file to FTP: {}').format(e))
+                    'Problem uploading file to FTP: {}').format(e))
+            if not _ftp_pool().runs.get(self._ftp_session_key()):
+                # not in a generation run, the session is not kept
+                self._close_ftp_session(ftp=ftp)
+            return True
         else:
             return super(CarrierFile, self)._write_file(filename, file_content)
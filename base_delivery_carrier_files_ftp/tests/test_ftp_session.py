@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+import ftplib
+
+import mock
+
+from openerp.tests.common import TransactionCase
+
+MODULE = 'openerp.addons.base_delivery_carrier_files_ftp.model.carrier_file'
+
+
+class TestFtpSession(TransactionCase):
+    """Test the FTP sessions reused during a generation run."""
+
+    def setUp(self):
+        super(TestFtpSession, self).setUp()
+        self.carrier_file = self.env['delivery.carrier.file'].create({
+            'name': 'Test FTP',
+            'type': 'generic',
+            'write_mode': 'ftp',
+            'ftp_host': 'ftp.example.com',
+        })
+        self.pickings = self.env['stock.picking'].browse()
+        for __ in range(2):
+            self.pickings |= self.env['stock.picking'].create({
+                'partner_id': self.env.ref('base.res_partner_12').id,
+                'picking_type_id': self.env.ref(
+                    'stock.picking_type_out').id,
+            })
+        self.sessions = []
+
+        def connect(*args):
+            session = mock.Mock()
+            self.sessions.append(session)
+            return session
+
+        patcher = mock.patch(MODULE + '.FTP', side_effect=connect)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_session_reused_in_run(self):
+        """One session uploads all the files of a run."""
+        self.carrier_file._generate_files(self.pickings.ids)
+        self.assertEqual(len(self.sessions), 1)
+        self.assertEqual(self.sessions[0].storbinary.call_count, 2)
+        self.assertEqual(self.sessions[0].quit.call_count, 1)
+        self.assertTrue(all(self.pickings.mapped('carrier_file_generated')))
+
+    def test_session_outside_run(self):
+        """A file written outside a run closes its session."""
+        self.carrier_file._write_file('a.csv', 'content')
+        self.carrier_file._write_file('b.csv', 'content')
+        self.assertEqual(len(self.sessions), 2)
+        for session in self.sessions:
+            self.assertEqual(session.quit.call_count, 1)
+
+    def test_broken_session(self):
+        """A session which failed an upload is not reused."""
+        stored = []
+
+        def storbinary(command, file_handle, blocksize=None):
+            if not stored:
+                stored.append(command)
+                raise ftplib.error_temp('421 Timeout')
+            stored.append(command)
+
+        with mock.patch(MODULE + '.FTP') as ftp_class:
+            ftp_class.return_value.storbinary.side_effect = storbinary
+            self.carrier_file._generate_files(self.pickings.ids)
+        self.assertEqual(ftp_class.call_count, 2)
+        self.assertEqual(len(stored), 2)
+        self.assertEqual(self.pickings.mapped('carrier_file_generated'),
+                         [False, True])
+
+    def test_idle_session_checked(self):
+        """An idle session dropped by the server is opened again."""
+        dropped = mock.Mock()
+        dropped.voidcmd.side_effect = EOFError
+        with mock.patch(MODULE + '.FTP_NOOP_INTERVAL', -1), \
+                mock.patch(MODULE + '.FTP') as ftp_class:
+            ftp_class.side_effect = [dropped, mock.Mock()]
+            self.carrier_file._generate_files(self.pickings.ids)
+        self.assertEqual(ftp_class.call_count, 2)
+        self.assertEqual(dropped.storbinary.call_count, 1)
+        self.assertTrue(all(self.pickings.mapped('carrier_file_generated')))
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+##############################################################################
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+##############################################################################
+import hashlib
+import os
+import uuid
+
+from openerp import models, api
+
+# permissions of the stored files, the umask of the process is applied
+# on it when the file is created, as with open()
+FILE_MODE = 0o666
+
+
+class IrAttachment(models.Model):
+    _inherit = 'ir.attachment'
+
+    @api.model
+    def _store_file_content(self, chunks):
+        """ Stream the content of a file in the filestore
+
+        The content is hashed and written by chunks in a temporary file
+        renamed according to its checksum, as ir.attachment does, so no
+        other copy of the content is built in memory.
+
+        :param chunks: iterable of the chunks of the content
+        :return: tuple (store_fname, file_size, checksum)
+        """
+        filestore = self._filestore()
+        if not os.path.isdir(filestore):
+            os.makedirs(filestore)
+        sha = hashlib.sha1()
+        file_size = 0
+        # not tempfile, which creates the file readable by its owner
+        # only, the umask is applied as for the files of ir.attachment
+        tmp_path = os.path.join(filestore, '.%s.tmp' % uuid.uuid4().hex)
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL,
+                     FILE_MODE)
+        try:
+            with os.fdopen(fd, 'wb') as tmp_file:
+                for chunk in chunks:
+                    sha.update(chunk)
+                    file_size += len(chunk)
+                    tmp_file.write(chunk)
+            checksum = sha.hexdigest()
+            # same layout as ir.attachment, legacy path first
+            for fname in (checksum[:3] + '/' + checksum,
+                          checksum[:2] + '/' + checksum):
+                full_path = self._full_path(fname)
+                if os.path.isfile(full_path):
+                    os.unlink(tmp_path)
+                    return fname, file_size, checksum
+            dirname = os.path.dirname(full_path)
+            if not os.path.isdir(dirname):
+                os.makedirs(dirname)
+            os.rename(tmp_path, full_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return fname, file_size, checksum
+
+    @api.model
+    def _write_stored_files(self, stored_files):
+        """ Link attachments to the files stored by _store_file_content
+
+        ir.attachment ignores file_size on create, the stored files are
+        set as its _data_set does, with one query for all of them.
+
+        :param stored_files: list of tuples (store_fname, file_size,
+                             attachment id)
+        """
+        if not stored_files:
+            return
+        self.env.cr.executemany(
+            "UPDATE ir_attachment SET store_fname = %s, file_size = %s, "
+            "db_datas = NULL WHERE id = %s",
+            stored_files)
+        self.invalidate_cache()
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import os
+import stat
+import uuid
+
+from openerp.tests.common import TransactionCase
+
+
+class TestStoredFiles(TransactionCase):
+    """Test the files streamed to the filestore."""
+
+    def setUp(self):
+        super(TestStoredFiles, self).setUp()
+        self.attachment_obj = self.env['ir.attachment']
+        self.content = ''.join(chr(i % 256) for i in xrange(100001))
+        self.chunks = [self.content[i:i + 4096]
+                       for i in xrange(0, len(self.content), 4096)]
+
+    def _filestore_files(self):
+        filestore = self.attachment_obj._filestore()
+        if not os.path.isdir(filestore):
+            return set()
+        return set(name for name in os.listdir(filestore)
+                   if os.path.isfile(os.path.join(filestore, name)))
+
+    def test_store_file_content(self):
+        """The chunks are stored in one file named by their checksum."""
+        files = self._filestore_files()
+        fname, size, checksum = self.attachment_obj._store_file_content(
+            iter(self.chunks))
+        self.assertEqual(checksum, hashlib.sha1(self.content).hexdigest())
+        self.assertEqual(size, len(self.content))
+        full_path = self.attachment_obj._full_path(fname)
+        with open(full_path, 'rb') as handle:
+            self.assertEqual(handle.read(), self.content)
+        # the same content is not stored twice
+        self.assertEqual(
+            self.attachment_obj._store_file_content(iter(self.chunks)),
+            (fname, size, checksum))
+        # no temporary file left
+        self.assertEqual(self._filestore_files(), files)
+
+    def test_file_mode(self):
+        """The stored file follows the umask, as ir.attachment."""
+        umask = os.umask(0)
+        os.umask(umask)
+        # a new content, not stored by a previous run
+        fname, __, __ = self.attachment_obj._store_file_content(
+            [uuid.uuid4().hex])
+        mode = os.stat(self.attachment_obj._full_path(fname)).st_mode
+        self.assertEqual(stat.S_IMODE(mode), 0o666 & ~umask)
+
+    def test_write_stored_files(self):
+        """The attachments read the stored files."""
+        fname, size, __ = self.attachment_obj._store_file_content(
+            iter(self.chunks))
+        attachments = (self.attachment_obj.create({'name': 'a.bin'}) |
+                       self.attachment_obj.create({'name': 'b.bin'}))
+        # read before the files are set, so the cache is outdated
+        self.assertFalse(attachments[0].file_size)
+        self.attachment_obj._write_stored_files(
+            [(fname, size, attachment.id) for attachment in attachments])
+        for attachment in attachments:
+            self.assertEqual(attachment.store_fname, fname)
+            self.assertEqual(attachment.file_size, size)
+            self.assertEqual(attachment.datas.decode('base64'),
+                             self.content)
@@ -21,4 +21,6 @@
 from . import delivery
 from . import stock
 from . import carrier_account
+from . import label_job
+from . import sequence
 from . import wizard
@@ -25,13 +25,18 @@
  'maintainer': 'Camptocamp',
  'category': 'Delivery',
  'complexity': 'normal',
- 'depends': ['delivery'],
+ 'depends': ['delivery',
+             'base_delivery_carrier_filestore',
+             ],
  'website': 'http://www.camptocamp.com/',
  'data': ['delivery_view.xml',
           'stock_view.xml',
           'res_config_view.xml',
           'security/ir.model.access.csv',
           'wizard/manifest_wizard_view.xml',
+          'label_job_view.xml',
+          'label_job_data.xml',
+          'sequence_view.xml',
           ],
  'tests': [],
  'installable': True,
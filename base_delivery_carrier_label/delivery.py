@@ -19,7 +19,46 @@
 #    along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
 ##############################################################################
-from openerp import models, fields, api
+from openerp import models, fields, api, tools
+
+
+class DeliveryCarrierCacheMixin(models.AbstractModel):
+    """ Clear the caches filled from the records when they change
+
+    The carrier data read for every picking are indexed with
+    ``tools.ormcache``. The models inheriting this mixin clear the
+    caches of the models listed in ``_cache_models``, their own by
+    default, after each create, write and unlink.
+
+    """
+    _name = 'delivery.carrier.cache.mixin'
+    _description = 'Clear the carrier caches on changes'
+
+    _cache_models = ()
+
+    @api.model
+    def _clear_carrier_caches(self):
+        for model in self._cache_models or (self._name,):
+            self.env[model].clear_caches()
+
+    @api.model
+    @api.returns('self', lambda value: value.id)
+    def create(self, vals):
+        res = super(DeliveryCarrierCacheMixin, self).create(vals)
+        self._clear_carrier_caches()
+        return res
+
+    @api.multi
+    def write(self, vals):
+        res = super(DeliveryCarrierCacheMixin, self).write(vals)
+        self._clear_carrier_caches()
+        return res
+
+    @api.multi
+    def unlink(self):
+        res = super(DeliveryCarrierCacheMixin, self).unlink()
+        self._clear_carrier_caches()
+        return res
 
 
 class DeliveryCarrierTemplateOption(models.Model):
@@ -46,8 +85,11 @@ class DeliveryCarrierOption(models.Model):
 
     """
     _name = 'delivery.carrier.option'
+    _inherit = 'delivery.carrier.cache.mixin'
     _description = 'Delivery carrier option'
     _inherits = {'delivery.carrier.template.option': 'tmpl_option_id'}
+    # the options of the carriers are cached by delivery.carrier
+    _cache_models = ('delivery.carrier',)
 
     mandatory = fields.Boolean(
         help="If checked, this option is necessarily applied "
@@ -96,11 +138,39 @@ class DeliveryCarrier(models.Model):
         string='Option',
     )
 
+    @tools.ormcache(skiparg=2)
+    def _get_option_ids(self, cr, uid, carrier_id):
+        """ Default and mandatory options of a carrier
+
+        Cached per user and carrier, the cache is cleared when the
+        options are modified. Use ``default_options`` and
+        ``mandatory_options`` which can be inherited.
+
+        :return: tuple (default option ids, mandatory option ids),
+                 default options including the mandatory ones
+        """
+        carrier = self.browse(cr, uid, carrier_id)
+        default_ids = []
+        mandatory_ids = []
+        for available_option in carrier.available_option_ids:
+            if available_option.mandatory:
+                mandatory_ids.append(available_option.id)
+            if available_option.mandatory or available_option.by_default:
+                default_ids.append(available_option.id)
+        return tuple(sorted(default_ids)), tuple(sorted(mandatory_ids))
+
     @api.multi
     def default_options(self):
         """ Returns default and available options for a carrier """
-        options = self.env['delivery.carrier.option'].browse()
-        for available_option in self.available_option_ids:
-            if (available_option.mandatory or available_option.by_default):
-                options |= available_option
-        return options
+        option_ids = set()
+        for carrier in self:
+            option_ids.update(self._get_option_ids(carrier.id)[0])
+        return self.env['delivery.carrier.option'].browse(sorted(option_ids))
+
+    @api.multi
+    def mandatory_options(self):
+        """ Returns mandatory options for a carrier """
+        option_ids = set()
+        for carrier in self:
+            option_ids.update(self._get_option_ids(carrier.id)[1])
+        return self.env['delivery.carrier.option'].browse(sorted(option_ids))
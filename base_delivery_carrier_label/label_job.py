@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+##############################################################################
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+##############################################################################
+from datetime import timedelta
+import logging
+
+from openerp import models, fields, api
+from openerp.exceptions import except_orm
+from openerp.tools import ustr
+
+_logger = logging.getLogger(__name__)
+
+# delay before the first retry of a failed job, doubled at each attempt
+RETRY_DELAY_MINUTES = 1
+# a started job not finished after this delay is considered as crashed
+STALE_DELAY_MINUTES = 60
+
+
+class ShippingLabelJob(models.Model):
+    """ Queued generation of the shipping labels of a picking
+
+    The jobs are claimed with ``FOR UPDATE SKIP LOCKED`` (PostgreSQL 9.5+)
+    so several Odoo workers or servers can run ``run_jobs`` concurrently
+    without generating twice the labels of a picking.
+
+    """
+    _name = 'shipping.label.job'
+    _description = 'Shipping Label Generation Job'
+    _order = 'date_planned, id'
+
+    picking_id = fields.Many2one(
+        comodel_name='stock.picking',
+        string='Picking',
+        required=True,
+        ondelete='cascade',
+        index=True,
+    )
+    carrier_type = fields.Selection(
+        related='picking_id.carrier_type',
+        readonly=True,
+    )
+    package_ids = fields.Many2many(
+        comodel_name='stock.quant.package',
+        string='Packs',
+        help="Only the labels of these packs are generated. "
+             "All the packs of the picking when empty.",
+    )
+    state = fields.Selection(
+        selection=[('pending', 'Pending'),
+                   ('started', 'Started'),
+                   ('done', 'Done'),
+                   ('failed', 'Failed'),
+                   ],
+        required=True,
+        readonly=True,
+        default='pending',
+        index=True,
+    )
+    date_planned = fields.Datetime(
+        string='Planned Date',
+        required=True,
+        readonly=True,
+        default=fields.Datetime.now,
+        index=True,
+    )
+    date_started = fields.Datetime(string='Started Date', readonly=True)
+    date_done = fields.Datetime(string='Done Date', readonly=True)
+    attempts = fields.Integer(readonly=True)
+    max_attempts = fields.Integer(
+        string='Maximum Attempts',
+        default=5,
+        help="The job fails after this number of attempts, "
+             "the delay between 2 attempts is doubled each time.",
+    )
+    error = fields.Text(readonly=True)
+
+    @api.model
+    def _claim_jobs(self, limit=None):
+        """ Claim the pending jobs ready to be run
+
+        The claimed jobs are set as started, the jobs already claimed by
+        a concurrent transaction are skipped.
+
+        """
+        now = fields.Datetime.now()
+        query = ("UPDATE shipping_label_job "
+                 "SET state = 'started', date_started = %s, "
+                 "    attempts = attempts + 1 "
+                 "WHERE id IN ("
+                 "    SELECT id FROM shipping_label_job "
+                 "    WHERE state = 'pending' AND date_planned <= %s "
+                 "    ORDER BY date_planned, id "
+                 "    LIMIT %s "
+                 "    FOR UPDATE SKIP LOCKED) "
+                 "RETURNING id")
+        self.env.cr.execute(query, (now, now, limit))
+        job_ids = [row[0] for row in self.env.cr.fetchall()]
+        self.invalidate_cache()
+        return self.browse(sorted(job_ids))
+
+    @api.model
+    def _requeue_stale_jobs(self):
+        """ Put back in the queue the jobs of a crashed worker """
+        limit = fields.Datetime.from_string(fields.Datetime.now())
+        limit -= timedelta(minutes=STALE_DELAY_MINUTES)
+        stale_jobs = self.search(
+            [('state', '=', 'started'),
+             ('date_started', '<', fields.Datetime.to_string(limit))])
+        stale_jobs.write({'state': 'pending'})
+        return stale_jobs
+
+    @api.multi
+    def _process(self):
+        """ Generate the labels of claimed jobs
+
+        Each job is run in a savepoint, a failed job is planned again
+        later until its maximum number of attempts is reached.
+
+        """
+        for job in self:
+            try:
+                with self.env.cr.savepoint():
+                    job.picking_id.generate_labels(
+                        package_ids=job.package_ids.ids or None)
+            except Exception as err:
+                self.invalidate_cache()
+                _logger.info('Label generation of the picking %s failed',
+                             job.picking_id.name, exc_info=True)
+                job._set_failed(err)
+            else:
+                job.write({'state': 'done',
+                           'date_done': fields.Datetime.now(),
+                           'error': False,
+                           })
+        return True
+
+    @api.multi
+    def _set_failed(self, err):
+        self.ensure_one()
+        if isinstance(err, except_orm):
+            message = ustr(err.value)
+        else:
+            message = ustr(err)
+        vals = {'error': message}
+        if self.attempts < self.max_attempts:
+            delay = RETRY_DELAY_MINUTES * 2 ** max(self.attempts - 1, 0)
+            date = fields.Datetime.from_string(fields.Datetime.now())
+            date += timedelta(minutes=delay)
+            vals.update(state='pending',
+                        date_planned=fields.Datetime.to_string(date))
+        else:
+            vals['state'] = 'failed'
+        self.write(vals)
+
+    @api.model
+    def run_jobs(self, limit=20):
+        """ Run the queued jobs, method called by the scheduler
+
+        The jobs are claimed and run by chunks of ``limit`` jobs, each
+        chunk being committed, until the queue is empty.
+
+        """
+        self._requeue_stale_jobs()
+        self.env.cr.commit()
+        while True:
+            jobs = self._claim_jobs(limit=limit)
+            # release the claim lock, the jobs are now started
+            self.env.cr.commit()
+            if not jobs:
+                break
+            jobs._process()
+            self.env.cr.commit()
+        return True
+
+    @api.multi
+    def action_retry(self):
+        self.write({'state': 'pending',
+                    'attempts': 0,
+                    'date_planned': fields.Datetime.now(),
+                    })
+        return True
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+##############################################################################
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+##############################################################################
+from collections import deque
+import threading
+
+from openerp import models, fields, api, _
+from openerp.exceptions import Warning as UserError, ValidationError
+
+# numbers reserved by this process, {(dbname, sequence id): deque}
+_reserved_numbers = {}
+# only held to read or fill _reserved_numbers, never during a query
+_reserved_lock = threading.Lock()
+
+
+class NoGapNumberInWorker(Exception):
+    """ Raised when a label worker draws a number of a "no gap" sequence
+
+    The number would be given again if the transaction of the worker
+    was rolled back after the number was sent to the carrier, so the
+    picking is generated by the calling transaction instead.
+    """
+
+
+class IrSequence(models.Model):
+    """ Reservation of the numbers of a sequence by blocks
+
+    The carriers take a number for each picking or parcel. With a
+    ``reservation_size`` greater than 1, ``next_by_id_reserved`` and
+    ``next_by_code_reserved`` reserve that many numbers at once with
+    the PostgreSQL sequence, then hand them out from the memory of the
+    process, at the cost of gaps for the numbers still reserved when a
+    process stops. Only the sequences of the standard implementation
+    can be reserved, a "no gap" sequence would lose its guarantee.
+
+    """
+    _inherit = 'ir.sequence'
+
+    reservation_size = fields.Integer(
+        string='Numbers Reserved by Block',
+        help="Used by the carriers, the numbers are reserved by blocks "
+             "of this size for each server process, which avoids the "
+             "contention on the sequence when labels are generated "
+             "concurrently. The numbers still reserved when a process "
+             "stops are lost. No reservation when lower than 2. Only "
+             "for the standard implementation.",
+    )
+
+    @api.constrains('reservation_size', 'implementation')
+    def _check_reservation_size(self):
+        for sequence in self:
+            if (sequence.reservation_size > 1 and
+                    sequence.implementation != 'standard'):
+                raise ValidationError(
+                    _('The numbers of the sequence %s cannot be reserved '
+                      'by blocks: only the sequences of the standard '
+                      'implementation can be reserved.') % sequence.name)
+
+    @api.multi
+    def write(self, vals):
+        result = super(IrSequence, self).write(vals)
+        # the numbers reserved by the other processes are kept
+        with _reserved_lock:
+            for sequence_id in self.ids:
+                _reserved_numbers.pop((self.env.cr.dbname, sequence_id),
+                                      None)
+        return result
+
+    def _next(self, cr, uid, ids, context=None):
+        if context and context.get('label_worker'):
+            for sequence in self.browse(cr, uid, ids, context=context):
+                if sequence.implementation != 'standard':
+                    raise NoGapNumberInWorker(sequence.name)
+        return super(IrSequence, self)._next(cr, uid, ids, context=context)
+
+    @api.multi
+    def _reserve_numbers(self, size):
+        """ Reserve a block of numbers of the sequence
+
+        nextval() is not transactional and never waits for a lock: the
+        numbers are not given twice if the current transaction is
+        rolled back.
+
+        :return: list of the reserved numbers
+        """
+        self.ensure_one()
+        self.env.cr.execute("SELECT nextval('ir_sequence_%03d') "
+                            "FROM generate_series(1, %%s)" % self.id,
+                            (size,))
+        return [row[0] for row in self.env.cr.fetchall()]
+
+    @api.multi
+    def _next_reserved(self, max_number=None):
+        self.ensure_one()
+        self.check_access_rights('read')
+        sequence = self.sudo()
+        size = sequence.reservation_size
+        interpolation = sequence._interpolation_dict()
+        prefix = sequence._interpolate(sequence.prefix, interpolation)
+        suffix = sequence._interpolate(sequence.suffix, interpolation)
+        if size < 2 or sequence.implementation != 'standard':
+            # no reservation, the number is drawn as usual
+            formatted = self.next_by_id(self.id)
+            if formatted and max_number is not None:
+                number = formatted[len(prefix):len(formatted) - len(suffix)]
+                if number.isdigit() and int(number) > max_number:
+                    raise UserError(
+                        _('The sequence %s reached its maximum number '
+                          '%s.') % (sequence.name, max_number))
+            return formatted
+        key = (self.env.cr.dbname, sequence.id)
+        number = None
+        with _reserved_lock:
+            numbers = _reserved_numbers.get(key)
+            if numbers:
+                number = numbers.popleft()
+        if number is None:
+            # the block is reserved without holding the lock, the
+            # numbers of the blocks reserved concurrently are all kept
+            block = sequence._reserve_numbers(size)
+            number = block.pop(0)
+            with _reserved_lock:
+                _reserved_numbers.setdefault(key, deque()).extend(block)
+        if max_number is not None and number > max_number:
+            raise UserError(
+                _('The sequence %s reached its maximum number %s.') %
+                (sequence.name, max_number))
+        return prefix + '%%0%sd' % sequence.padding % number + suffix
+
+    @api.model
+    def next_by_id_reserved(self, sequence_id, max_number=None):
+        """ Draw the next number of a sequence, from the block of numbers
+        reserved by the process when the sequence has a reservation size
+
+        :param sequence_id: id of the sequence
+        :param max_number: maximum number allowed by the carrier, an
+                           error is raised above it
+        :return: the formatted number
+        """
+        return self.browse(sequence_id)._next_reserved(max_number=max_number)
+
+    @api.model
+    def next_by_code_reserved(self, sequence_code, max_number=None):
+        """ Same as next_by_id_reserved for the sequence of the company of
+        the user having this code
+
+        :return: the formatted number, False when there is no sequence
+        """
+        company_ids = self.env['res.company'].search([]).ids + [False]
+        sequences = self.sudo().search(
+            [('code', '=', sequence_code),
+             ('company_id', 'in', company_ids)])
+        if not sequences:
+            return False
+        force_company = self.env.context.get('force_company')
+        if not force_company:
+            force_company = self.env.user.company_id.id
+        preferred = sequences.filtered(
+            lambda seq: seq.company_id.id == force_company)
+        sequence = (preferred or sequences)[0]
+        return self.browse(sequence.id)._next_reserved(
+            max_number=max_number)
@@ -21,13 +21,100 @@
 #    along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
 ##############################################################################
+from collections import OrderedDict
+from contextlib import closing
+import hashlib
+import Queue
+import threading
+
+import psycopg2
+from psycopg2.errorcodes import LOCK_NOT_AVAILABLE
+
 from openerp import models, fields, api, _
-from openerp.exceptions import Warning as UserError
+from openerp.exceptions import Warning as UserError, except_orm
+from openerp.modules.registry import RegistryManager
+from openerp.tools import ustr
 import openerp.addons.decimal_precision as dp
+from .sequence import NoGapNumberInWorker
 import logging
 
 _logger = logging.getLogger(__name__)
 
+# milliseconds a label worker waits for a locked row before giving
+# the picking back to the calling transaction
+LABEL_WORKER_LOCK_TIMEOUT = 5000
+
+# size of the chunks of label content written in the filestore,
+# multiple of 4 to decode base64 chunks
+LABEL_CHUNK_SIZE = 64 * 1024
+
+
+def _write_grouped_by_value(records, field_name, values):
+    """ Write values on records with one write per distinct value
+
+    :param values: dict {record_id: value}, records already having
+                   their value are not written
+    """
+    ids_by_value = {}
+    for record in records:
+        value = values[record.id]
+        if record[field_name] != value:
+            ids_by_value.setdefault(value, []).append(record.id)
+    for value, record_ids in ids_by_value.iteritems():
+        records.browse(record_ids).write({field_name: value})
+
+
+def _generate_labels_new_cursor(dbname, uid, context, picking_id,
+                                package_ids=None):
+    """ Generate the labels of a picking in its own transaction
+
+    The transaction is committed with the labels and everything the
+    carrier wrote, so the numbers sent to the carrier are kept, or
+    rolled back on errors.
+
+    :return: dict with either ``done``, an ``error`` message, ``locked``
+             when the picking is locked, by the calling transaction for
+             instance, or ``deferred`` when the carrier needs a number of
+             a "no gap" sequence, only drawn by the calling transaction
+    """
+    with api.Environment.manage():
+        registry = RegistryManager.get(dbname)
+        with closing(registry.cursor()) as cr:
+            env = api.Environment(cr, uid, dict(context, label_worker=True))
+            picking = env['stock.picking'].browse(picking_id)
+            try:
+                # never wait for a lock held by the calling transaction,
+                # it waits for this thread
+                cr.execute("SET LOCAL lock_timeout = %s",
+                           (LABEL_WORKER_LOCK_TIMEOUT,))
+                try:
+                    cr.execute("SELECT id FROM stock_picking "
+                               "WHERE id = %s FOR UPDATE NOWAIT",
+                               (picking_id,))
+                except psycopg2.OperationalError as err:
+                    if err.pgcode != LOCK_NOT_AVAILABLE:
+                        raise
+                    cr.rollback()
+                    return {'locked': True}
+                labels = picking.generate_shipping_labels_batch(
+                    package_ids=package_ids or None)
+                env['shipping.label'].create_batch(
+                    [(picking, labels.get(picking_id, []))])
+                cr.commit()
+                return {'done': True}
+            except NoGapNumberInWorker:
+                cr.rollback()
+                return {'deferred': True}
+            except Exception as err:
+                # a lock timeout is an error as well, the carrier may
+                # have been called already
+                cr.rollback()
+                _logger.exception('Label generation failed for the '
+                                  'picking %s', picking_id)
+                if isinstance(err, except_orm):
+                    return {'error': ustr(err.value)}
+                return {'error': ustr(err)}
+
 
 class StockPackOperation(models.Model):
     _inherit = 'stock.pack.operation'
@@ -41,37 +128,50 @@ class StockPackOperation(models.Model):
     def get_weight(self):
         """Calc and save weight of pack.operations.
 
-        Warning: Type conversion not implemented
-                it will return False if at least one uom or uos not in kg
         return:
             the sum of the weight of [self]
         """
-        total_weight = 0
-        kg = self.env.ref('product.product_uom_kgm').id
-        units = self.env.ref('product.product_uom_unit').id
-        allowed = (False, kg, units)
-        cant_calc_total = False
+        weights = self._compute_weights()
+        return sum(weights.itervalues())
+
+    @api.multi
+    def _compute_weights(self):
+        """Calc and save the weight of the pack.operations in one pass.
+
+        The products and the units of measure of all the operations are
+        read at once. The quantity of an operation is converted into the
+        unit of measure of its product, the one in which ``weight`` and
+        ``weight_net`` are expressed (in kg per unit).
+
+        return:
+            dict {operation_id: weight}
+        """
+        products = self.mapped('product_id')
+        uoms = self.mapped('product_uom_id') | products.mapped('uom_id')
+        uom_factors = dict(
+            (uom.id, (uom.category_id.id, uom.factor)) for uom in uoms)
 
+        weights = {}
         for operation in self:
             product = operation.product_id
-
-            # if not defined we assume it's in kg
-            if not (
-                product.uom_id.id in allowed or
-                product.uos_id.id in allowed
-            ):
-                _logger.warning(
-                    'Type conversion not implemented for product %s' %
-                    product.id)
-                cant_calc_total = True
+            qty = operation.product_qty
+            from_uom = operation.product_uom_id.id
+            to_uom = product.uom_id.id
+            if from_uom and to_uom and from_uom != to_uom:
+                from_categ, from_factor = uom_factors[from_uom]
+                to_categ, to_factor = uom_factors[to_uom]
+                if from_categ == to_categ:
+                    qty = qty / from_factor * to_factor
+                else:
+                    _logger.warning(
+                        'Cannot convert the quantity of the operation %s '
+                        'to the unit of measure of the product %s',
+                        operation.id, product.id)
             weight = product.weight or product.weight_net
-            operation.weight = (weight * operation.product_qty)
-
-            total_weight += operation.weight
+            weights[operation.id] = weight * qty
 
-        if cant_calc_total:
-            return False
-        return total_weight
+        _write_grouped_by_value(self, 'weight', weights)
+        return weights
 
 
 class StockQuantPackage(models.Model):
@@ -113,38 +213,48 @@ class StockQuantPackage(models.Model):
         weights 0.5kg, the weight of PACK67 should be: 13.5kg
 
         """
-        total_weight = 0
-
-        for package in self:
-            # weight of the wrapper
-            packaging_weight = 0
-            if package.ul_id:
-                packaging_weight = package.ul_id.weight
+        weights = self._compute_weight_tree()
+        return sum(weights[package.id] for package in self)
 
-            # package.pack_operations would be too easy
-            operations = self.env['stock.pack.operation'].search(
-                [('result_package_id', '=', package.id),
-                 ('product_id', '!=', False),
-                 ])
-
-            # we make use get_weight with  @api.muli instead of
-            # sum([op.get_weight for op in operations])
-
-            # sum of the pack_operation
-            payload_weight = operations.get_weight()
+    @api.multi
+    def _compute_weight_tree(self):
+        """Compute and save the weight of the packages and their children.
 
-            # sum of the packages contained in this package (children)
-            child_packages_weight = package.children_ids.get_weight()
+        The whole tree of packages and all the pack operations put in
+        them are loaded at once, then the weights are summed bottom-up
+        so each package is computed only once, whatever the depth of the
+        tree or the number of pickings pointing to it.
 
-            # sum and save in package
-            package.weight = (
-                payload_weight +
-                child_packages_weight +
-                packaging_weight)
+        :return: dict {package_id: weight} for all the packages of the tree
+        """
+        if not self:
+            return {}
+        # children always have a greater parent_left than their parent
+        packages = self.search([('id', 'child_of', self.ids)],
+                               order='parent_left desc')
+        operations = self.env['stock.pack.operation'].search(
+            [('result_package_id', 'in', packages.ids),
+             ('product_id', '!=', False),
+             ])
+        operation_weights = operations._compute_weights()
+        payload_weights = dict.fromkeys(packages.ids, 0)
+        for operation in operations:
+            package_id = operation.result_package_id.id
+            payload_weights[package_id] += operation_weights[operation.id]
 
-            total_weight += package.weight
+        weights = {}
+        for package in packages:
+            # weight of the wrapper
+            packaging_weight = package.ul_id.weight if package.ul_id else 0
+            payload_weight = payload_weights[package.id]
+            child_packages_weight = sum(
+                weights.get(child.id, 0) for child in package.children_ids)
+            weights[package.id] = (payload_weight +
+                                   child_packages_weight +
+                                   packaging_weight)
 
-        return total_weight
+        _write_grouped_by_value(packages, 'weight', weights)
+        return weights
 
 
 class StockPicking(models.Model):
@@ -201,6 +311,9 @@ class StockPicking(models.Model):
         :return: list of dict containing
            name: name to give to the attachement
            file: file as string
+           file_base64: file encoded in base64, to give instead of file
+                        when the carrier answers with base64, so it is
+                        decoded while being written in the filestore
            file_type: string of file type like 'PDF'
            (optional)
            tracking_id: tracking_id if picking lines have tracking_id and
@@ -218,6 +331,66 @@ class StockPicking(models.Model):
             labels.append(pack_label)
         return labels
 
+    @api.multi
+    def generate_shipping_labels_batch(self, package_ids=None):
+        """Generate the shipping labels of several pickings at once
+
+        All the pickings given share the same carrier type. This method
+        can be inherited by the carrier modules able to set up their web
+        service (configuration, login, ...) only once for a whole batch.
+        By default, it falls back to ``generate_shipping_labels`` for
+        each picking.
+
+        :param package_ids: optional list of ``stock.quant.package`` ids
+                             only packs in this list will have their label
+                             printed (all are generated when None)
+
+        :return: dict {picking_id: list of labels as returned by
+                                   ``generate_shipping_labels``}
+
+        """
+        labels = {}
+        for pick in self:
+            labels[pick.id] = pick.generate_shipping_labels(
+                package_ids=package_ids
+            )
+        return labels
+
+    @api.multi
+    def _group_by_carrier_type(self):
+        """ Split the pickings by carrier type, keeping their order
+
+        :return: list of tuples (carrier_type, pickings)
+
+        """
+        groups = OrderedDict()
+        for pick in self:
+            carrier_type = pick.carrier_id.type
+            groups.setdefault(carrier_type, self.browse())
+            groups[carrier_type] |= pick
+        return groups.items()
+
+    @api.model
+    def _write_tracking_refs(self, tracking_refs):
+        """ Write the tracking references received for a batch of pickings
+
+        Used by the batch label generations to write the references once
+        all the labels have been received from the carrier.
+
+        The references are written with one write per distinct
+        reference, the pickings already having theirs are skipped.
+
+        :param tracking_refs: dict {picking_id: carrier_tracking_ref}
+
+        """
+        if not tracking_refs:
+            return
+        pickings = self.browse(list(tracking_refs))
+        _write_grouped_by_value(
+            pickings, 'carrier_tracking_ref',
+            dict((picking_id, tracking_ref or False)
+                 for picking_id, tracking_ref in tracking_refs.iteritems()))
+
     @api.multi
     def generate_labels(self, package_ids=None):
         """ Generate the labels.
@@ -225,33 +398,159 @@ class StockPicking(models.Model):
         A list of package ids can be given, in that case it will generate
         the labels only of these packages.
 
+        The pickings are grouped by carrier type, so each carrier can
+        generate the labels of its group in one batch.
+
         """
         label_obj = self.env['shipping.label']
 
+        errors = {}
+        for carrier_type, pickings in self._group_by_carrier_type():
+            workers = self._get_label_workers(carrier_type)
+            if workers > 1 and len(pickings) > 1:
+                errors.update(pickings._generate_labels_parallel(
+                    workers, package_ids=package_ids))
+                continue
+            batch_labels = pickings.generate_shipping_labels_batch(
+                package_ids=package_ids or None
+            )
+            label_obj.create_batch(
+                [(pick, batch_labels.get(pick.id, [])) for pick in pickings]
+            )
+        if errors:
+            messages = [u'%s: %s' % (self.browse(picking_id).name, message)
+                        for picking_id, message in sorted(errors.items())]
+            raise UserError(
+                _('The labels of the following pickings could not be '
+                  'generated:\n%s') % u'\n'.join(messages))
+        return True
+
+    @api.model
+    def _get_label_workers(self, carrier_type):
+        """ Number of pickings of a carrier type generated in parallel
+
+        Read from the ``delivery_carrier_label.workers.<carrier type>``
+        system parameter, the labels are generated serially when it is
+        not set or lower than 2.
+
+        """
+        if not carrier_type or getattr(self.pool, 'test_cr', None):
+            # the threads would not see the data of the test transaction
+            return 1
+        param_obj = self.env['ir.config_parameter'].sudo()
+        workers = param_obj.get_param(
+            'delivery_carrier_label.workers.%s' % carrier_type)
+        try:
+            return max(int(workers or 1), 1)
+        except ValueError:
+            _logger.warning('Invalid number of label workers for the '
+                            'carrier type %s: %s', carrier_type, workers)
+            return 1
+
+    @api.multi
+    def _generate_labels_parallel(self, workers, package_ids=None):
+        """ Generate the labels of the pickings in a pool of threads
+
+        Each thread generates the labels of a picking in a new cursor,
+        committed once the labels are created. The calling transaction
+        does not see these commits (repeatable read), it must not write
+        the pickings generated by the threads afterwards. The remaining
+        pickings are generated by ``_save_label_results``.
+
+        :param workers: maximum number of threads
+        :return: dict {picking_id: error message} of the failed pickings
+
+        """
+        dbname = self.env.cr.dbname
+        uid = self.env.uid
+        context = dict(self.env.context)
+        tasks = Queue.Queue()
+        for picking_id in self.ids:
+            tasks.put(picking_id)
+        results = {}
+
+        def worker():
+            threading.current_thread().dbname = dbname
+            while True:
+                try:
+                    picking_id = tasks.get_nowait()
+                except Queue.Empty:
+                    return
+                results[picking_id] = _generate_labels_new_cursor(
+                    dbname, uid, context, picking_id, package_ids)
+
+        threads = [threading.Thread(target=worker)
+                   for __ in range(min(workers, len(self)))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return self._save_label_results(results, package_ids=package_ids)
+
+    @api.model
+    def _save_label_results(self, results, package_ids=None):
+        """ Complete the generation of the labels by the threads
+
+        The pickings the threads could not lock, or which need a number
+        of a "no gap" sequence, are generated here, in the calling
+        transaction.
+
+        :param results: dict {picking_id: result}, result as returned by
+                        ``_generate_labels_new_cursor``
+        :return: dict {picking_id: error message} of the failed pickings
+
+        """
+        errors = {}
+        remaining = self.browse()
+        for picking in self.browse(sorted(results)):
+            result = results[picking.id]
+            if result.get('locked') or result.get('deferred'):
+                remaining |= picking
+            elif 'error' in result:
+                errors[picking.id] = result['error']
+        # the values cached before the threads are outdated
+        self.invalidate_cache()
+        if remaining:
+            batch_labels = remaining.generate_shipping_labels_batch(
+                package_ids=package_ids or None)
+            self.env['shipping.label'].create_batch(
+                [(pick, batch_labels.get(pick.id, []))
+                 for pick in remaining])
+        return errors
+
+    @api.model
+    def _use_label_queue(self, carrier_type):
+        """ Whether the labels of a carrier type are generated by jobs
+
+        Enabled by the ``delivery_carrier_label.queue.<carrier type>``
+        system parameter.
+
+        """
+        if not carrier_type:
+            return False
+        param_obj = self.env['ir.config_parameter'].sudo()
+        value = param_obj.get_param(
+            'delivery_carrier_label.queue.%s' % carrier_type)
+        return value not in (False, '', '0', 'False', 'false')
+
+    @api.multi
+    def generate_labels_async(self, package_ids=None):
+        """ Queue the generation of the labels
+
+        Create a ``shipping.label.job`` per picking, the labels are then
+        generated by the scheduler.
+
+        :return: the created jobs
+
+        """
+        job_obj = self.env['shipping.label.job']
+        jobs = job_obj.browse()
         for pick in self:
+            vals = {'picking_id': pick.id}
             if package_ids:
-                shipping_labels = pick.generate_shipping_labels(
-                    package_ids=package_ids
-                )
-            else:
-                shipping_labels = pick.generate_shipping_labels()
-            for label in shipping_labels:
-                data = {
-                    'name': label['name'],
-                    'res_id': pick.id,
-                    'res_model': 'stock.picking',
-                    'datas': label['file'].encode('base64'),
-                    'file_type': label['file_type'],
-                }
-                if label.get('package_id'):
-                    data['package_id'] = label['package_id']
-                context_attachment = self.env.context.copy()
-                # remove default_type setted for stock_picking
-                # as it would try to define default value of attachement
-                if 'default_type' in context_attachment:
-                    del context_attachment['default_type']
-                label_obj.with_context(context_attachment).create(data)
-        return True
+                vals['package_ids'] = [(6, 0, package_ids)]
+            jobs |= job_obj.create(vals)
+        return jobs
 
     @api.multi
     def action_generate_carrier_label(self):
@@ -288,9 +587,8 @@ class StockPicking(models.Model):
         if not self.carrier_id:
             return
         carrier = self.carrier_id
-        for available_option in carrier.available_option_ids:
-            if (available_option.mandatory and
-                    available_option not in self.option_ids):
+        for available_option in carrier.mandatory_options():
+            if available_option not in self.option_ids:
                 # XXX the client does not allow to modify the field that
                 # triggered the onchange:
                 # https://github.com/odoo/odoo/issues/2693#issuecomment-56825399
@@ -309,6 +607,7 @@ class StockPicking(models.Model):
         if carrier_id and not option_ids:
             carrier_obj = self.env['delivery.carrier']
             carrier = carrier_obj.browse(carrier_id)
+            # cached per carrier
             default_options = carrier.default_options()
             if default_options:
                 values.update(option_ids=[(6, 0, default_options.ids)])
@@ -319,19 +618,53 @@ class StockPicking(models.Model):
     def _get_packages_from_picking(self):
         """ Get all the packages from the picking """
         self.ensure_one()
+        return self._get_packages_from_pickings()[self.id]
+
+    @api.multi
+    def _get_packages_from_pickings(self, package_ids=None):
+        """ Get all the packages of several pickings with one search
+
+        :param package_ids: optional ids of packages, the packages of the
+                            pickings are restricted to them
+        :return: dict {picking_id: packages}, in the order of the
+                 pack operations
+        """
         operation_obj = self.env['stock.pack.operation']
-        packages = self.env['stock.quant.package'].browse()
+        packages = dict((picking_id, []) for picking_id in self.ids)
         operations = operation_obj.search(
             ['|',
              ('package_id', '!=', False),
              ('result_package_id', '!=', False),
-             ('picking_id', '=', self.id)]
+             ('picking_id', 'in', self.ids)]
         )
         for operation in operations:
             # Take the destination package. If empty, the package is
             # moved so take the source one.
-            packages |= operation.result_package_id or operation.package_id
-        return packages
+            package = operation.result_package_id or operation.package_id
+            if package_ids is not None and package.id not in package_ids:
+                continue
+            picking_packages = packages[operation.picking_id.id]
+            if package.id not in picking_packages:
+                picking_packages.append(package.id)
+        package_obj = self.env['stock.quant.package']
+        return dict((picking_id, package_obj.browse(ids))
+                    for picking_id, ids in packages.iteritems())
+
+    @api.multi
+    def _get_number_of_parcels(self, packages=None):
+        """ Number of parcels of the picking announced to the carrier
+
+        The number of packages given on the picking, otherwise the
+        number of the packages read by the batch, at least 1.
+
+        :param packages: packages of the picking, as returned by
+                         ``_get_packages_from_pickings``, not counted
+                         when None
+        """
+        self.ensure_one()
+        if self.number_of_packages or packages is None:
+            return self.number_of_packages or 1
+        return len(packages) or 1
 
     @api.multi
     def write(self, vals):
@@ -382,29 +715,53 @@ class StockPicking(models.Model):
 
     @api.multi
     def set_pack_weight(self):
+        """ Compute and save the weight of the packages of the pickings
+
+        The packages of all the pickings are computed in one batch, so
+        a package used by several pack operations is computed only once.
+
+        """
         # I cannot loop on the "quant_ids" of packages, because, at this step,
         # this field doesn't have a value yet
-        self.ensure_one()
-        for packop in self.pack_operation_ids:
-            package = packop.result_package_id or packop.package_id
-            if package:
-                weight = package.get_weight()
-                package.write({'weight': weight})
+        packages = self.env['stock.quant.package'].browse()
+        for packop in self.mapped('pack_operation_ids'):
+            packages |= packop.result_package_id or packop.package_id
+        packages.get_weight()
         return
 
     @api.multi
     def _check_existing_shipping_label(self):
         """ Check that labels don't already exist for this picking """
         self.ensure_one()
-        labels = self.env['shipping.label'].search([
-            ('res_id', '=', self.id),
+        self._check_existing_shipping_labels()
+
+    @api.multi
+    def _get_existing_shipping_labels(self):
+        """ Get the shipping labels of several pickings with one search
+
+        :return: dict {picking_id: shipping labels}
+        """
+        label_obj = self.env['shipping.label']
+        label_ids = dict((picking_id, []) for picking_id in self.ids)
+        labels = label_obj.search([
+            ('res_id', 'in', self.ids),
             ('res_model', '=', 'stock.picking')])
-        if labels:
-            raise UserError(
-                _('Some labels already exist for the picking %s.\n'
-                  'Please delete the existing labels in the '
-                  'attachments of this picking and try again')
-                % self.name)
+        for label in labels:
+            label_ids[label.res_id].append(label.id)
+        return dict((picking_id, label_obj.browse(ids))
+                    for picking_id, ids in label_ids.iteritems())
+
+    @api.multi
+    def _check_existing_shipping_labels(self):
+        """ Check that labels don't already exist for these pickings """
+        existing_labels = self._get_existing_shipping_labels()
+        for pick in self:
+            if existing_labels[pick.id]:
+                raise UserError(
+                    _('Some labels already exist for the picking %s.\n'
+                      'Please delete the existing labels in the '
+                      'attachments of this picking and try again')
+                    % pick.name)
 
 
 class ShippingLabel(models.Model):
@@ -432,10 +789,203 @@ class ShippingLabel(models.Model):
         default='pdf',
     )
     package_id = fields.Many2one(comodel_name='stock.quant.package',
-                                 string='Pack')
+                                 string='Pack',
+                                 index=True)
     attachment_id = fields.Many2one(
         comodel_name='ir.attachment',
         string='Attachement',
         required=True,
         ondelete='cascade',
+        index=True,
     )
+    checksum = fields.Char(
+        readonly=True,
+        index=True,
+        help="SHA1 of the content of the label, an identical label "
+             "generated again for the same picking and pack, with the "
+             "same name, reuses this one.",
+    )
+    ref_count = fields.Integer(
+        string='Generation Count',
+        readonly=True,
+        default=1,
+        help="Number of times this label has been generated.",
+    )
+
+    @api.model
+    def _prepare_label(self, picking, label):
+        """ Values of a shipping label attached to a picking
+
+        The content of the label is not part of the values.
+
+        :param label: dict as returned by
+                      ``stock.picking.generate_shipping_labels``
+        """
+        vals = {
+            'name': label['name'],
+            'res_id': picking.id,
+            'res_model': 'stock.picking',
+            'file_type': label['file_type'],
+        }
+        if label.get('package_id'):
+            vals['package_id'] = label['package_id']
+        return vals
+
+    @api.model
+    def _label_datas(self, label):
+        """ Content of a label encoded in base64 """
+        if 'file_base64' in label:
+            return label['file_base64']
+        return label['file'].encode('base64')
+
+    @api.model
+    def _iter_label_content(self, label):
+        """ Iterate on the content of a label by chunks
+
+        A base64 content is decoded chunk by chunk, so no other copy of
+        the content is built in memory.
+        """
+        encoded = 'file_base64' in label
+        content = label['file_base64'] if encoded else label['file']
+        remainder = ''
+        for start in xrange(0, len(content), LABEL_CHUNK_SIZE):
+            chunk = content[start:start + LABEL_CHUNK_SIZE]
+            if encoded:
+                # decode only complete groups of 4 characters
+                chunk = remainder + ''.join(chunk.split())
+                usable = len(chunk) - len(chunk) % 4
+                remainder = chunk[usable:]
+                chunk = chunk[:usable].decode('base64')
+            yield chunk
+        if remainder:
+            yield remainder.decode('base64')
+
+    @api.model
+    def _label_checksum(self, label):
+        sha = hashlib.sha1()
+        for chunk in self._iter_label_content(label):
+            sha.update(chunk)
+        return sha.hexdigest()
+
+    @api.model
+    def _store_label_file(self, label):
+        """ Stream the content of a label in the filestore
+
+        :return: tuple (store_fname, file_size, checksum)
+        """
+        return self.env['ir.attachment']._store_file_content(
+            self._iter_label_content(label))
+
+    @api.model
+    def create_batch(self, labels_by_picking):
+        """ Create the shipping labels of several pickings
+
+        The Odoo 8 ORM has no multi-record create, so each label is still
+        created on its own, through ``ir.attachment.create`` and its
+        access checks. The values of all the labels are prepared first,
+        then the labels are created with the same context. When the
+        attachments are stored in the filestore, the contents are
+        streamed there first and the references of all the stored files
+        are saved on the attachments with one query.
+
+        A label identical to a label already saved for the same picking
+        and pack, with the same name, file type and content, is not
+        created again: the existing one is returned and its generation
+        count is increased. Its content is not written in the filestore.
+
+        :param labels_by_picking: list of tuples (picking, labels), labels
+                                  as returned by
+                                  ``stock.picking.generate_shipping_labels``
+        :return: the created or reused shipping labels
+        """
+        entries = []
+        for picking, labels in labels_by_picking:
+            for label in labels:
+                vals = self._prepare_label(picking, label)
+                vals['checksum'] = self._label_checksum(label)
+                entries.append((label, vals))
+        if not entries:
+            return self.browse()
+
+        # only the labels saved before this batch are reused
+        existing = self.search(
+            [('res_model', '=', 'stock.picking'),
+             ('res_id', 'in', list(set(vals['res_id']
+                                       for __, vals in entries))),
+             ('checksum', 'in', list(set(vals['checksum']
+                                         for __, vals in entries))),
+             ])
+        known = dict((label._dedup_key(), label) for label in existing)
+
+        context = self.env.context.copy()
+        # remove default_type setted for stock_picking
+        # as it would try to define default value of attachement
+        context.pop('default_type', None)
+        label_obj = self.with_context(context)
+        in_filestore = self.env['ir.attachment']._storage() == 'file'
+        label_ids = []
+        reused = {}
+        stored_files = []
+        for label, vals in entries:
+            key = (vals['res_id'], vals.get('package_id') or False,
+                   vals['name'], vals['file_type'], vals['checksum'])
+            if key in known:
+                shipping_label = known[key]
+                reused.setdefault(shipping_label.id, 0)
+                reused[shipping_label.id] += 1
+                label_ids.append(shipping_label.id)
+                continue
+            stored_file = None
+            if in_filestore:
+                stored_file = self._store_label_file(label)
+            else:
+                vals['datas'] = self._label_datas(label)
+            shipping_label = label_obj.create(vals)
+            if stored_file:
+                stored_files.append(
+                    (stored_file[0], stored_file[1],
+                     shipping_label.attachment_id.id))
+            label_ids.append(shipping_label.id)
+        self.env['ir.attachment']._write_stored_files(stored_files)
+        for label_id, count in reused.iteritems():
+            shipping_label = self.browse(label_id)
+            shipping_label.ref_count += count
+        # keep the order, without duplicates
+        unique_ids = []
+        for label_id in label_ids:
+            if label_id not in unique_ids:
+                unique_ids.append(label_id)
+        return self.browse(unique_ids)
+
+    @api.multi
+    def _dedup_key(self):
+        self.ensure_one()
+        return (self.res_id, self.package_id.id or False, self.name,
+                self.file_type, self.checksum)
+
+    @api.model
+    def purge_duplicate_labels(self):
+        """ Remove the duplicated labels, keeping the most recent one
+
+        Labels are duplicates when they have the same name, file type
+        and content for the same document and pack. The generation count
+        of the label kept includes the removed ones.
+
+        """
+        self.env.cr.execute(
+            "SELECT array_agg(l.id ORDER BY l.id DESC) "
+            "FROM shipping_label l "
+            "JOIN ir_attachment a ON a.id = l.attachment_id "
+            "WHERE l.checksum IS NOT NULL "
+            "GROUP BY a.res_model, a.res_id, l.package_id, a.name, "
+            "         l.file_type, l.checksum "
+            "HAVING count(*) > 1")
+        duplicates = self.browse()
+        for (label_ids,) in self.env.cr.fetchall():
+            kept = self.browse(label_ids[0])
+            removed = self.browse(label_ids[1:])
+            kept.ref_count += sum(removed.mapped('ref_count'))
+            duplicates |= removed
+        # the attachments are removed by the cascade
+        duplicates.mapped('attachment_id').unlink()
+        return True
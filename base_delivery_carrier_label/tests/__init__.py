@@ -1 +1,6 @@
 from . import test_get_weight
+from . import test_label_job
+from . import test_shipping_label
+from . import test_generate_labels
+from . import test_carrier_options
+from . import test_sequence_reservation
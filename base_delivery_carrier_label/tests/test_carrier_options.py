@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+
+from openerp.tests.common import TransactionCase
+
+
+class TestCarrierOptions(TransactionCase):
+    """Test the default options of the carriers."""
+
+    def _create_option(self, name, **vals):
+        template = self.env['delivery.carrier.template.option'].create({
+            'name': name,
+            'code': name,
+        })
+        vals.update(tmpl_option_id=template.id, carrier_id=self.carrier.id)
+        return self.env['delivery.carrier.option'].create(vals)
+
+    def _create_picking(self):
+        return self.env['stock.picking'].create({
+            'partner_id': self.env.ref('base.res_partner_12').id,
+            'picking_type_id': self.env.ref('stock.picking_type_out').id,
+            'carrier_id': self.carrier.id,
+        })
+
+    def setUp(self):
+        super(TestCarrierOptions, self).setUp()
+        self.carrier = self.env['delivery.carrier'].create({
+            'name': 'Test carrier',
+            'partner_id': self.env.ref('base.res_partner_12').id,
+            'product_id': self.env.ref('product.product_product_1').id,
+        })
+        self.mandatory = self._create_option('MANDATORY', mandatory=True)
+        self.optional = self._create_option('OPTIONAL')
+
+    def test_default_options(self):
+        """The default options follow the changes of the options."""
+        self.assertEqual(self.carrier.default_options(), self.mandatory)
+        self.assertEqual(self.carrier.mandatory_options(), self.mandatory)
+        self.assertEqual(self._create_picking().option_ids, self.mandatory)
+        # the cache is cleared when an option changes
+        self.optional.by_default = True
+        self.assertEqual(self.carrier.default_options(),
+                         self.mandatory | self.optional)
+        self.assertEqual(self._create_picking().option_ids,
+                         self.mandatory | self.optional)
+        self.mandatory.unlink()
+        self.assertEqual(self._create_picking().option_ids, self.optional)
+        self.assertFalse(self.carrier.mandatory_options())
@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+
+import threading
+
+import mock
+
+from openerp.exceptions import Warning as UserError
+from openerp.tests.common import TransactionCase
+
+
+class SharedCursor(object):
+    """Cursor of a label worker running in the test transaction.
+
+    The workers use the cursor one at a time, their transactions are
+    emulated with a savepoint.
+    """
+
+    def __init__(self, cr, lock):
+        self._cr = cr
+        self._lock = lock
+        self._lock.acquire()
+        self._cr.execute('SAVEPOINT label_worker')
+
+    def __getattr__(self, name):
+        return getattr(self._cr, name)
+
+    def commit(self):
+        self._cr.execute('RELEASE SAVEPOINT label_worker')
+        self._cr.execute('SAVEPOINT label_worker')
+
+    def rollback(self):
+        self._cr.execute('ROLLBACK TO SAVEPOINT label_worker')
+
+    def close(self):
+        self._cr.execute('RELEASE SAVEPOINT label_worker')
+        self._lock.release()
+
+
+class TestGenerateLabels(TransactionCase):
+    """Test the generation of the labels of several pickings."""
+
+    def _create_carrier(self, carrier_type):
+        return self.env['delivery.carrier'].create({
+            'name': 'Test carrier %s' % carrier_type,
+            'partner_id': self.env.ref('base.res_partner_12').id,
+            'product_id': self.env.ref('product.product_product_1').id,
+            'type': carrier_type,
+        })
+
+    def _create_picking(self, carrier):
+        return self.env['stock.picking'].create({
+            'partner_id': self.env.ref('base.res_partner_12').id,
+            'picking_type_id': self.env.ref('stock.picking_type_out').id,
+            'carrier_id': carrier.id,
+        })
+
+    def _labels(self, pickings):
+        return self.env['shipping.label'].search(
+            [('res_model', '=', 'stock.picking'),
+             ('res_id', 'in', pickings.ids)])
+
+    def setUp(self):
+        super(TestGenerateLabels, self).setUp()
+        carrier_class = type(self.env['delivery.carrier'])
+        patcher = mock.patch.object(
+            carrier_class, '_get_carrier_type_selection',
+            return_value=[('carrier_a', 'A'), ('carrier_b', 'B')])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        carrier_a = self._create_carrier('carrier_a')
+        carrier_b = self._create_carrier('carrier_b')
+        self.picking_a1 = self._create_picking(carrier_a)
+        self.picking_b = self._create_picking(carrier_b)
+        self.picking_a2 = self._create_picking(carrier_a)
+        self.pickings = self.picking_a1 | self.picking_b | self.picking_a2
+
+    def test_batch_by_carrier_type(self):
+        """The batch hook is called once per carrier type."""
+        batches = []
+
+        def generate_shipping_labels_batch(pickings, package_ids=None):
+            batches.append(pickings.ids)
+            tracking_refs = dict((pick.id, 'REF%s' % pick.id)
+                                 for pick in pickings)
+            pickings._write_tracking_refs(tracking_refs)
+            return dict((pick.id, [{'name': 'label.pdf',
+                                    'file': 'label %s' % pick.id,
+                                    'file_type': 'pdf'}])
+                        for pick in pickings)
+
+        picking_class = type(self.env['stock.picking'])
+        with mock.patch.object(picking_class,
+                               'generate_shipping_labels_batch',
+                               autospec=True,
+                               side_effect=generate_shipping_labels_batch):
+            self.pickings.generate_labels()
+        self.assertEqual(
+            batches,
+            [[self.picking_a1.id, self.picking_a2.id], [self.picking_b.id]])
+        for pick in self.pickings:
+            self.assertEqual(pick.carrier_tracking_ref, 'REF%s' % pick.id)
+            self.assertEqual(len(self._labels(pick)), 1)
+
+    def test_save_label_results(self):
+        """The pickings left by the threads are generated here."""
+        label = {'name': 'label.pdf', 'file': 'label', 'file_type': 'pdf'}
+        picking_class = type(self.env['stock.picking'])
+        fake_carrier = mock.patch.object(
+            picking_class, 'generate_shipping_labels_batch',
+            return_value={self.picking_a2.id: [label],
+                          self.picking_b.id: [label]})
+        picking_c = self.picking_a1.copy()
+        with fake_carrier as generate_batch:
+            errors = self.env['stock.picking']._save_label_results({
+                self.picking_a1.id: {'done': True},
+                picking_c.id: {'error': 'Carrier unavailable'},
+                self.picking_a2.id: {'locked': True},
+                self.picking_b.id: {'deferred': True},
+            })
+        self.assertEqual(errors, {picking_c.id: 'Carrier unavailable'})
+        self.assertFalse(self._labels(self.picking_a1 | picking_c))
+        # the locked and deferred pickings are generated by the calling
+        # transaction in one batch
+        self.assertEqual(generate_batch.call_count, 1)
+        self.assertEqual(len(self._labels(self.picking_a2)), 1)
+        self.assertEqual(len(self._labels(self.picking_b)), 1)
+
+    def test_generate_labels_parallel(self):
+        """The threads keep the writes of the carriers.
+
+        A "no gap" number is drawn by the calling transaction and a
+        failed picking is rolled back.
+        """
+        sequence = self.env['ir.sequence'].create({
+            'name': 'Test no gap',
+            'implementation': 'no_gap',
+        })
+        numbers = {}
+
+        def generate_shipping_labels_batch(pickings, package_ids=None):
+            for pick in pickings:
+                pick.number_of_packages = 2
+                if pick == self.picking_b:
+                    numbers[pick.id] = pickings.env[
+                        'ir.sequence'].next_by_id(sequence.id)
+                elif pick == self.picking_a2:
+                    raise UserError('Carrier unavailable')
+            return dict((pick.id, [{'name': 'label.pdf',
+                                    'file': 'label %s' % pick.id,
+                                    'file_type': 'pdf'}])
+                        for pick in pickings)
+
+        lock = threading.Lock()
+        registry = mock.Mock()
+        registry.cursor.side_effect = lambda: SharedCursor(self.cr, lock)
+        picking_class = type(self.env['stock.picking'])
+        with mock.patch.object(picking_class,
+                               'generate_shipping_labels_batch',
+                               autospec=True,
+                               side_effect=generate_shipping_labels_batch), \
+                mock.patch('openerp.addons.base_delivery_carrier_label.'
+                           'stock.RegistryManager') as registry_manager:
+            registry_manager.get.return_value = registry
+            errors = self.pickings._generate_labels_parallel(2)
+        self.assertEqual(errors,
+                         {self.picking_a2.id: 'Carrier unavailable'})
+        self.assertEqual(self.picking_a1.number_of_packages, 2)
+        self.assertEqual(len(self._labels(self.picking_a1)), 1)
+        # only one number, drawn by the calling transaction
+        self.assertEqual(numbers, {self.picking_b.id: '1'})
+        self.assertEqual(sequence.number_next, 2)
+        self.assertEqual(len(self._labels(self.picking_b)), 1)
+        self.assertFalse(self.picking_a2.number_of_packages)
+        self.assertFalse(self._labels(self.picking_a2))
+
+    def test_number_of_parcels(self):
+        """The parcels are the packages when their number is not set."""
+        package = self.env['stock.quant.package'].create({})
+        self.assertEqual(self.picking_a1._get_number_of_parcels(), 1)
+        self.assertEqual(
+            self.picking_a1._get_number_of_parcels(packages=package), 1)
+        self.assertEqual(
+            self.picking_a1._get_number_of_parcels(
+                packages=package | package.copy()), 2)
+        self.picking_a1.number_of_packages = 3
+        self.assertEqual(
+            self.picking_a1._get_number_of_parcels(packages=package), 3)
+
+    def test_packages_from_pickings(self):
+        """The selected packages are split by picking."""
+        package_obj = self.env['stock.quant.package']
+        product = self.env.ref('product.product_product_9')
+        packages = {}
+        for pick in (self.picking_a1, self.picking_a2):
+            packages[pick.id] = package_obj.create({}) | package_obj.create({})
+            for package in packages[pick.id]:
+                self.env['stock.pack.operation'].create({
+                    'picking_id': pick.id,
+                    'product_id': product.id,
+                    'product_uom_id': product.uom_id.id,
+                    'product_qty': 1,
+                    'location_id': self.env.ref(
+                        'stock.stock_location_stock').id,
+                    'location_dest_id': self.env.ref(
+                        'stock.stock_location_customers').id,
+                    'result_package_id': package.id,
+                })
+        pickings = self.picking_a1 | self.picking_a2
+        self.assertEqual(pickings._get_packages_from_pickings(), packages)
+        selected = (packages[self.picking_a1.id][0] |
+                    packages[self.picking_a2.id])
+        by_picking = pickings._get_packages_from_pickings(
+            package_ids=selected.ids)
+        self.assertEqual(by_picking[self.picking_a1.id],
+                         packages[self.picking_a1.id][0])
+        self.assertEqual(by_picking[self.picking_a2.id],
+                         packages[self.picking_a2.id])
+        self.assertEqual(self.picking_a1._get_number_of_parcels(
+            packages=by_picking[self.picking_a1.id]), 1)
+        self.assertEqual(self.picking_a2._get_number_of_parcels(
+            packages=by_picking[self.picking_a2.id]), 2)
+
+    def test_write_tracking_refs(self):
+        """The references are written by the ORM, once per reference."""
+        self.picking_b.carrier_tracking_ref = 'REF'
+        picking_class = type(self.env['stock.picking'])
+        write = picking_class.write
+        with mock.patch.object(picking_class, 'write', autospec=True,
+                               side_effect=write) as write_mock:
+            self.env['stock.picking']._write_tracking_refs({
+                self.picking_a1.id: 'REF',
+                self.picking_a2.id: 'REF',
+                self.picking_b.id: 'REF',
+            })
+        self.assertEqual(write_mock.call_count, 1)
+        self.assertEqual(write_mock.call_args[0][0],
+                         self.picking_a1 | self.picking_a2)
+        for pick in self.pickings:
+            self.assertEqual(pick.carrier_tracking_ref, 'REF')
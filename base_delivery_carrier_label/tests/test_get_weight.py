@@ -175,6 +175,46 @@ class TestGetWeight(TransactionCase):
             packages_weight + products_weight
         )
 
+    def test_get_weight_nested(self):
+        """Check packages in packages are computed bottom-up."""
+        # prepare some data
+        weights = [2, 4]
+        products = self._get_products(weights)
+        picking = self._generate_picking(products)
+        uls = self._create_ul()
+        pallet = self.env['stock.quant.package'].create(
+            {'ul_id': uls[1].id})
+        boxes = [
+            self.env['stock.quant.package'].create({
+                'ul_id': uls[0].id,
+                'parent_id': pallet.id,
+            }) for product in products
+        ]
+        for product, box in zip(products, boxes):
+            self._create_operation(picking, {
+                'product_qty': 2,
+                'product_id': product.id,
+                'product_uom_id': product.uom_id.id,
+                'result_package_id': box.id,
+            })
+        # end of prepare data
+
+        expected = (
+            sum([product.weight * 2 for product in products]) +
+            uls[0].weight * len(boxes) +
+            uls[1].weight)
+        self.assertAlmostEqual(pallet.get_weight(), expected)
+        self.assertAlmostEqual(pallet.weight, expected)
+        for product, box in zip(products, boxes):
+            self.assertAlmostEqual(
+                box.weight, product.weight * 2 + uls[0].weight)
+
+        # the whole picking in one batch gives the same result
+        boxes[0].weight = 0
+        picking.set_pack_weight()
+        self.assertAlmostEqual(
+            boxes[0].weight, products[0].weight * 2 + uls[0].weight)
+
     def test_get_weight_with_uom(self):
         """Check with differents uom."""
         # prepare some data
@@ -210,11 +250,6 @@ class TestGetWeight(TransactionCase):
                 'weight': weights[2],
             })
         )
-        products_weight = (
-            weights[0] * 1000 +  # tonne
-            weights[1] * 1 +  # kg
-            weights[2] * 0.01  # g
-        )
         picking = self._generate_picking(products)
         operations = []
         for product in products:
@@ -226,9 +261,30 @@ class TestGetWeight(TransactionCase):
             }))
         # end of prepare data
 
-        # because uom conversion is not implemented
-        self.assertEqual(package.get_weight(), False)
+        # weights are given per unit of measure of the product
+        self.assertAlmostEqual(package.get_weight(), sum(weights))
+
+    def test_get_weight_with_uom_conversion(self):
+        """Check the quantity is converted in the uom of the product."""
+        # prepare some data
+        unit = self.env.ref('product.product_uom_unit')
+        dozen = self.env.ref('product.product_uom_dozen')
+        product = self._create_product({
+            'name': 'OCA goodies',
+            'uom_id': unit.id,
+            'uos_id': unit.id,
+            'uom_po_id': unit.id,
+            'weight': 0.5,
+        })
+        picking = self._generate_picking([product])
+        package = self.env['stock.quant.package'].create({})
+        operation = self._create_operation(picking, {
+            'product_qty': 2,
+            'product_id': product.id,
+            'product_uom_id': dozen.id,
+            'result_package_id': package.id,
+        })
+        # end of prepare data
 
-        # if one day, uom conversion is implemented:
-        # self.assertEqual(package.get_weight(), products_weight)
-        self.assertEqual(products_weight, products_weight)  # flak8 warning
+        self.assertAlmostEqual(operation.get_weight(), 0.5 * 24)
+        self.assertAlmostEqual(package.get_weight(), 0.5 * 24)
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+import mock
+
+from openerp.tests.common import TransactionCase
+
+
+class TestLabelJob(TransactionCase):
+    """Test the queued generation of the labels."""
+
+    def setUp(self):
+        super(TestLabelJob, self).setUp()
+        self.job_model = self.env['shipping.label.job']
+        self.picking = self.env['stock.picking'].create({
+            'partner_id': self.env.ref('base.res_partner_12').id,
+            'picking_type_id': self.env.ref('stock.picking_type_out').id,
+        })
+        picking_class = type(self.env['stock.picking'])
+        # a fake carrier answering with a single label
+        self.fake_carrier = mock.patch.object(
+            picking_class, 'generate_shipping_labels',
+            return_value=[{'name': 'label.pdf',
+                           'file': 'fake label',
+                           'file_type': 'pdf',
+                           }])
+
+    def _labels(self):
+        return self.env['shipping.label'].search(
+            [('res_model', '=', 'stock.picking'),
+             ('res_id', '=', self.picking.id)])
+
+    def test_job_done(self):
+        """A claimed job generates the labels of its picking."""
+        job = self.picking.generate_labels_async()
+        self.assertEqual(job.state, 'pending')
+        claimed = self.job_model._claim_jobs()
+        self.assertEqual(claimed, job)
+        self.assertEqual(job.state, 'started')
+        self.assertEqual(job.attempts, 1)
+        # a job is claimed only once
+        self.assertFalse(self.job_model._claim_jobs())
+        with self.fake_carrier:
+            claimed._process()
+        self.assertEqual(job.state, 'done')
+        self.assertEqual(len(self._labels()), 1)
+
+    def test_job_retry(self):
+        """A failing job is planned later, then fails."""
+        job = self.picking.generate_labels_async()
+        job.max_attempts = 2
+        # no carrier on the picking: the default label raises an error
+        self.job_model._claim_jobs()._process()
+        self.assertEqual(job.state, 'pending')
+        self.assertTrue(job.error)
+        self.assertGreater(job.date_planned, job.date_started)
+        # not yet ready to be run again
+        self.assertFalse(self.job_model._claim_jobs())
+        job.date_planned = job.date_started
+        self.job_model._claim_jobs()._process()
+        self.assertEqual(job.state, 'failed')
+        self.assertEqual(job.attempts, 2)
+        self.assertFalse(self._labels())
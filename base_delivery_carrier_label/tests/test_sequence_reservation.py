@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+
+from openerp.tests.common import TransactionCase
+from openerp.exceptions import Warning as UserError, ValidationError
+
+
+class TestSequenceReservation(TransactionCase):
+    """Test the reservation of the sequence numbers by blocks."""
+
+    def _create_sequence(self, **vals):
+        values = {'name': 'Test carrier sequence',
+                  'implementation': 'no_gap',
+                  'padding': 4,
+                  'prefix': 'C',
+                  }
+        values.update(vals)
+        return self.env['ir.sequence'].create(values)
+
+    def test_no_reservation(self):
+        """Without reservation size, the numbers are drawn one by one."""
+        sequence = self._create_sequence()
+        seq_obj = self.env['ir.sequence']
+        self.assertEqual(seq_obj.next_by_id_reserved(sequence.id), 'C0001')
+        self.assertEqual(seq_obj.next_by_id_reserved(sequence.id), 'C0002')
+        self.assertEqual(sequence.number_next, 3)
+
+    def test_reserve_block(self):
+        """The numbers are reserved by blocks and handed out in order."""
+        sequence = self._create_sequence(implementation='standard',
+                                         reservation_size=5,
+                                         code='test.carrier.block')
+        seq_obj = self.env['ir.sequence']
+        numbers = [seq_obj.next_by_code_reserved('test.carrier.block')
+                   for __ in range(6)]
+        self.assertEqual(numbers,
+                         ['C0001', 'C0002', 'C0003', 'C0004', 'C0005',
+                          'C0006'])
+        # 2 blocks reserved
+        sequence.invalidate_cache()
+        self.assertEqual(sequence.number_next_actual, 11)
+
+    def test_max_number(self):
+        """A number above the carrier range is refused."""
+        sequence = self._create_sequence(implementation='standard',
+                                         reservation_size=3,
+                                         number_next=9)
+        seq_obj = self.env['ir.sequence']
+        self.assertEqual(
+            seq_obj.next_by_id_reserved(sequence.id, max_number=10), 'C0009')
+        self.assertEqual(
+            seq_obj.next_by_id_reserved(sequence.id, max_number=10), 'C0010')
+        with self.assertRaises(UserError):
+            seq_obj.next_by_id_reserved(sequence.id, max_number=10)
+
+    def test_max_number_no_reservation(self):
+        """The maximum number is also checked without reservation."""
+        sequence = self._create_sequence(number_next=10)
+        seq_obj = self.env['ir.sequence']
+        self.assertEqual(
+            seq_obj.next_by_id_reserved(sequence.id, max_number=10), 'C0010')
+        with self.assertRaises(UserError):
+            seq_obj.next_by_id_reserved(sequence.id, max_number=10)
+
+    def test_no_gap_refused(self):
+        """The numbers of a no gap sequence cannot be reserved."""
+        with self.assertRaises(ValidationError):
+            self._create_sequence(reservation_size=5)
+        sequence = self._create_sequence(implementation='standard',
+                                         reservation_size=5)
+        with self.assertRaises(ValidationError):
+            sequence.implementation = 'no_gap'
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+
+import mock
+
+from openerp.exceptions import Warning as UserError
+from openerp.tests.common import TransactionCase
+
+
+class TestShippingLabel(TransactionCase):
+    """Test the creation of the shipping labels."""
+
+    def setUp(self):
+        super(TestShippingLabel, self).setUp()
+        self.picking = self.env['stock.picking'].create({
+            'partner_id': self.env.ref('base.res_partner_12').id,
+            'picking_type_id': self.env.ref('stock.picking_type_out').id,
+        })
+        # bigger than a chunk, with a length which is not a multiple of 3
+        self.content = ''.join(chr(i % 256) for i in xrange(200001))
+
+    def test_create_batch(self):
+        """Raw and base64 contents give the same attachments.
+
+        Labels of the same batch are all created, even with the same
+        content.
+        """
+        labels = self.env['shipping.label'].create_batch([
+            (self.picking, [
+                {'name': 'raw.pdf',
+                 'file': self.content,
+                 'file_type': 'pdf'},
+                # MIME base64 with line breaks, as some carriers answer
+                {'name': 'encoded.pdf',
+                 'file_base64': self.content.encode('base64'),
+                 'file_type': 'pdf'},
+            ]),
+        ])
+        self.assertEqual(len(labels), 2)
+        for label in labels:
+            self.assertEqual(label.res_id, self.picking.id)
+            self.assertEqual(label.res_model, 'stock.picking')
+            self.assertEqual(label.datas.decode('base64'), self.content)
+        self.assertEqual(labels[0].store_fname, labels[1].store_fname)
+
+    def test_reuse_identical_label(self):
+        """An identical label of the same picking is not created again."""
+        label_obj = self.env['shipping.label']
+        label_vals = {'name': 'label.pdf',
+                      'file': self.content,
+                      'file_type': 'pdf'}
+        label = label_obj.create_batch([(self.picking, [label_vals])])
+        # the content of a reused label is not stored again
+        with mock.patch.object(type(label_obj), '_store_label_file',
+                               autospec=True) as store_label_file:
+            reprint = label_obj.create_batch(
+                [(self.picking, [label_vals])])
+        self.assertFalse(store_label_file.called)
+        self.assertEqual(reprint, label)
+        self.assertEqual(label.ref_count, 2)
+        # same content under another name or file type
+        renamed = label_obj.create_batch(
+            [(self.picking, [dict(label_vals, name='other.pdf')])])
+        self.assertNotEqual(renamed, label)
+        self.assertEqual(renamed.checksum, label.checksum)
+        other = label_obj.create_batch(
+            [(self.picking, [dict(label_vals, file='other content')])])
+        self.assertNotEqual(other, label)
+
+    def test_purge_duplicate_labels(self):
+        """Duplicated labels are removed, the most recent is kept."""
+        label_obj = self.env['shipping.label']
+        label = label_obj.create_batch([(self.picking, [
+            {'name': 'label.pdf',
+             'file': self.content,
+             'file_type': 'pdf'},
+        ])])
+        # a duplicate created before the deduplication
+        duplicate = label.copy()
+        self.assertEqual(duplicate.checksum, label.checksum)
+        label_obj.purge_duplicate_labels()
+        self.assertFalse(label.exists())
+        self.assertEqual(duplicate.ref_count, 2)
+
+    def test_existing_labels(self):
+        """The existing labels of several pickings are checked at once."""
+        other_picking = self.picking.copy()
+        pickings = self.picking | other_picking
+        self.assertEqual(pickings._get_existing_shipping_labels(),
+                         {self.picking.id: self.env['shipping.label'],
+                          other_picking.id: self.env['shipping.label']})
+        pickings._check_existing_shipping_labels()
+        label = self.env['shipping.label'].create_batch([(other_picking, [
+            {'name': 'label.pdf',
+             'file': self.content,
+             'file_type': 'pdf'},
+        ])])
+        existing = pickings._get_existing_shipping_labels()
+        self.assertEqual(existing[other_picking.id], label)
+        self.assertFalse(existing[self.picking.id])
+        with self.assertRaises(UserError):
+            pickings._check_existing_shipping_labels()
@@ -19,6 +19,8 @@
 #    along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
 ##############################################################################
+import itertools
+import operator
 import unicodedata
 import csv
 import base64
@@ -33,6 +35,7 @@ from openerp.addons.base_delivery_carrier_files.generator import \
 
 
 class DHLLine(BaseLine):
+    fixed_width = True
     fields = (
         ('cocodcli', 6),
         ('coanod', 1),
@@ -95,41 +98,26 @@ class DHLLine(BaseLine):
                        'cobultos', 'cokilos', 'cofecsal', 'coclpint',
                        'coprodu']
 
-    def get_fields(self):
-        """
-        According to the class attribute "fields",
-        generate a row with all the value of the line.
-        If a width is defined on some fields,
-        their content is cut to their maximal length.
-
-        :return: a list of values for each field in the
-                 order of the class attribute "fields"
-        """
-        res = []
-        zerofill_fields = self.zerofill_fields or []
-        for field in self.fields:
-            field_name, width = self._field_definition(field)
-            if field_name:
-                value = getattr(self, field_name)
-                if value in (False, None):
-                    value = ''
-                elif not isinstance(value, (str, unicode)):
-                    value = unicode(value)
-                if width:
-                    value = value[0:width]
-                    if field_name in zerofill_fields:
-                        value = value.zfill(width)
-                    if width > len(value):
-                        need_width = width - len(value)
-                        value = u"{}{}".format(value, ' ' * need_width)
-            else:
-                value = ''
-            res.append(value)
-        return res
-
 
 class DHLFileGenerator(CarrierFileGenerator):
 
+    prefetch_fields = ('name',
+                       'carrier_tracking_ref',
+                       'number_of_packages',
+                       'weight',
+                       'partner_id.name',
+                       'partner_id.street',
+                       'partner_id.street2',
+                       'partner_id.city',
+                       'partner_id.zip',
+                       'partner_id.phone',
+                       'partner_id.country_id.code',
+                       'picking_type_id.warehouse_id.partner_id.name',
+                       'picking_type_id.warehouse_id.partner_id.street',
+                       'picking_type_id.warehouse_id.partner_id.city',
+                       'picking_type_id.warehouse_id.partner_id.zip',
+                       'picking_type_id.warehouse_id.partner_id.phone')
+
     @classmethod
     def carrier_for(cls, carrier_name):
         return carrier_name == 'dhl_domestic_economy'
@@ -137,13 +125,10 @@ class DHLFileGenerator(CarrierFileGenerator):
     def _get_rows(self, picking, configuration):
         dhl_country_service_env = picking.env['dhl.country.service']
         ir_sequence_env = picking.env['ir.sequence']
-        country_services = dhl_country_service_env.search([
-            ('country_id', '=', picking.partner_id.country_id.id)
-        ])
-
-        if not country_services:
+        coprodu = dhl_country_service_env.get_service_number(
+            picking.partner_id.country_id.id)
+        if not coprodu:
             return []
-        coprodu = country_services.service_number
 
         time_now = datetime.now()
         line = DHLLine()
@@ -155,7 +140,7 @@ class DHLFileGenerator(CarrierFileGenerator):
         line.copade = picking.partner_id.country_id.code
         carrier_tracking_ref = picking.carrier_tracking_ref
         if not carrier_tracking_ref:
-            carrier_tracking_ref = ir_sequence_env.next_by_id(
+            carrier_tracking_ref = ir_sequence_env.next_by_id_reserved(
                 configuration.dhl_package_sequence.id)
             picking.write({'carrier_tracking_ref': carrier_tracking_ref})
         line.coexpe_ddd = carrier_tracking_ref
@@ -167,7 +152,7 @@ class DHLFileGenerator(CarrierFileGenerator):
         line.codirdes = ship_address
         line.copobdes = partner_id.city
         line.cocpdes = partner_id.zip
-        line.cpltfdes = partner_id.phone and partner_id.phone.replace(
+        line.cptlfdes = partner_id.phone and partner_id.phone.replace(
             '-', '').replace(' ', '').replace('.', '') or ''
         line.cobultos = picking.number_of_packages or "1"
         line.cokilos = int(picking.weight) or "1"
@@ -192,18 +177,16 @@ class DHLFileGenerator(CarrierFileGenerator):
         """
         Write the rows in the file (file_handle)
 
-        :param StringIO file_handle: file to write in
+        :param file file_handle: file-like object to write in
         :param rows: rows to write in the file
         :param browse_record configuration: configuration of the file to
                generate
-        :return: the file_handle as StringIO with the rows written in it
+        :return: the file_handle with the rows written in it
         """
-        row_text = ""
         for row in rows:
-            row_text += u"{}\n".format("".join(row))
-        row_text = unicodedata.normalize('NFKD', row_text).encode(
-            'ascii', 'ignore')
-        file_handle.write(row_text)
+            row_text = u"{}\n".format("".join(row))
+            file_handle.write(unicodedata.normalize('NFKD', row_text).encode(
+                'ascii', 'ignore'))
         return file_handle
 
     def _dhl_filename(self, configuration, extension='EXP'):
@@ -244,7 +227,7 @@ class DHLFileGenerator(CarrierFileGenerator):
             filename = self._get_filename_single(picking, configuration)
             filename = self.sanitize_filename(filename)
             rows = self._get_rows(picking, configuration)
-            file_content = self._get_file(rows, configuration)
+            file_content = self._get_file_stream(rows, configuration)
             files.append((filename, file_content, [picking.id]))
             # Generate manifest
             self._get_shippings_report(rows, configuration, filename)
@@ -264,17 +247,45 @@ class DHLFileGenerator(CarrierFileGenerator):
                  [('filename1', file, [picking ids]),
                   ('filename2', file2, [picking ids])]
         """
+        if configuration.max_rows or configuration.max_bytes:
+            return self._generate_files_chunked(pickings, configuration)
         files = []
-        rows = []
         filename = self._get_filename_grouped(configuration)
         filename = self.sanitize_filename(filename)
-        for picking in pickings:
-            rows += self._get_rows(picking, configuration)
-        file_content = self._get_file(rows, configuration)
+        # the rows are read twice: for the file and for the manifest
+        rows = list(self._iter_rows(pickings, configuration))
+        file_content = self._get_file_stream(rows, configuration)
         files.append((filename, file_content, [p.id for p in pickings]))
         self._get_shippings_report(rows, configuration, filename)
         return files
 
+    def _generate_files_chunked(self, pickings, configuration):
+        """
+        Generate the grouped files of the pickings in numbered chunks,
+        each chunk with its manifest.
+
+        :param browse_record pickings: list of browsable pickings records
+        :param browse_record configuration: configuration of
+                                            the file to generate
+        :return: iterator of tuple with files to create like:
+                 ('filename_001', file, [picking ids]),
+                 ('filename_002', file2, [picking ids])
+        """
+        chunks = itertools.groupby(
+            self._iter_chunked_rows(pickings, configuration),
+            key=operator.itemgetter(0))
+        for number, chunk in chunks:
+            filename = self._get_filename_chunk(configuration, number)
+            filename = self.sanitize_filename(filename)
+            rows = []
+            picking_ids = []
+            for __, picking, picking_rows, __ in chunk:
+                rows += picking_rows
+                picking_ids.append(picking.id)
+            file_content = self._get_file_stream(rows, configuration)
+            self._get_shippings_report(rows, configuration, filename)
+            yield (filename, file_content, picking_ids)
+
     def _get_shippings_report(self, rows, configuration, filename):
         dhl_line = DHLLine()
         dhl_fields = dhl_line.fields
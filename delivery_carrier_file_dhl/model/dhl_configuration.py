@@ -19,21 +19,69 @@
 #    along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
 ##############################################################################
-from openerp import models, fields
+from openerp import models, fields, api, tools
 
 
 class DHLCountryService(models.Model):
     _name = 'dhl.country.service'
+    _inherit = 'delivery.carrier.cache.mixin'
 
     country_id = fields.Many2one('res.country', 'Country', required=True)
     service_name = fields.Char('Service Name', required=True)
     service_code = fields.Char('Service Code')
     service_number = fields.Char('Service Code No.', required=True)
 
+    @tools.ormcache(skiparg=3)
+    def _get_service_index(self, cr, uid):
+        """ Index of the services by country id
+
+        Cached per registry, the cache is cleared when the services are
+        modified.
+
+        :return: dict {country id: service id}
+        """
+        cr.execute("SELECT country_id, id "
+                   "FROM dhl_country_service "
+                   "ORDER BY id DESC")
+        # the oldest service wins when a country has several ones
+        return dict(cr.fetchall())
+
+    @api.model
+    def get_service(self, country_id):
+        """ Return the service of a country, empty when there is none """
+        return self.browse(self._get_service_index().get(country_id, []))
+
+    @api.model
+    def get_service_number(self, country_id):
+        """ Return the service number of a country or False """
+        return self.get_service(country_id).service_number
+
 
 class DHLZipcodeFacility(models.Model):
     _name = 'dhl.zipcode.facility'
+    _inherit = 'delivery.carrier.cache.mixin'
 
     zipcode = fields.Char('Zipcode', required=True, select=True)
     facility_name = fields.Char('Facility Name', required=True)
     facility_code = fields.Char('Facility Code', required=True)
+
+    @tools.ormcache(skiparg=3)
+    def _get_facility_index(self, cr, uid):
+        """ Index of the facilities by zip code, formatted with
+        ``dhl_format_zip``
+
+        Cached per registry, the cache is cleared when the facilities
+        are modified.
+
+        :return: dict {zip code: facility id}
+        """
+        cr.execute("SELECT zipcode, id "
+                   "FROM dhl_zipcode_facility "
+                   "ORDER BY id DESC")
+        # the oldest facility wins when a zip code has several ones
+        return dict(cr.fetchall())
+
+    @api.model
+    def get_facility(self, zipcode):
+        """ Return the facility of a zip code, empty when there is none """
+        return self.browse(self._get_facility_index().get(zipcode, []))
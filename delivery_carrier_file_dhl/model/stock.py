@@ -68,14 +68,12 @@ class StockPicking(models.Model):
     def _dhl_country_service(self, country):
         self.ensure_one()
         dhl_country_service_env = self.env['dhl.country.service']
-        country_services = dhl_country_service_env.search([
-            ('country_id', '=', country.id)
-        ])
-        if not country_services:
+        country_service = dhl_country_service_env.get_service(country.id)
+        if not country_service:
             raise exceptions.Warning(
                 _('DHL service for country {} not found').format(
                     country.code))
-        return country_services[0]
+        return country_service
 
     @api.multi
     def _dhl_facility_code(self):
@@ -83,9 +81,7 @@ class StockPicking(models.Model):
         dhl_zipcode_facility_env = self.env['dhl.zipcode.facility']
         dhl_zip = dhl_format_zip(self.partner_id.country_id.code,
                                  self.partner_id.zip)
-        facility = dhl_zipcode_facility_env.search([
-            ('zipcode', '=', dhl_zip)
-        ])
+        facility = dhl_zipcode_facility_env.get_facility(dhl_zip)
         if not facility:
             raise exceptions.Warning(
                 _('No DHL Facility found for zipcode {}').format(dhl_zip))
@@ -138,7 +134,7 @@ class StockPicking(models.Model):
         label_template = mako_template_env.from_string(template_file.read())
         carrier_tracking_ref = self.carrier_tracking_ref
         if not carrier_tracking_ref:
-            carrier_tracking_ref = ir_sequence_env.next_by_id(
+            carrier_tracking_ref = ir_sequence_env.next_by_id_reserved(
                 dhl_configuration.dhl_package_sequence.id)
             self.write({'carrier_tracking_ref': carrier_tracking_ref})
 
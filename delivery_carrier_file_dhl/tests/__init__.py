@@ -0,0 +1,2 @@
+from . import test_dhl_generator
+from . import test_dhl_configuration
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+
+from openerp.tests.common import TransactionCase
+
+
+class TestDHLConfiguration(TransactionCase):
+    """Test the cached routing data of DHL."""
+
+    def test_country_service_cache(self):
+        """The cached services follow the changes of the table."""
+        service_obj = self.env['dhl.country.service']
+        country = self.env['res.country'].create({'name': 'Test Country',
+                                                  'code': 'Q1'})
+        self.assertFalse(service_obj.get_service(country.id))
+        service = service_obj.create({'country_id': country.id,
+                                      'service_name': 'Test',
+                                      'service_number': '12'})
+        self.assertEqual(service_obj.get_service(country.id), service)
+        service.service_number = '13'
+        self.assertEqual(service_obj.get_service_number(country.id), '13')
+        service.unlink()
+        self.assertFalse(service_obj.get_service_number(country.id))
+
+    def test_facility(self):
+        """The facility of the zip code of the partner is returned."""
+        facility = self.env['dhl.zipcode.facility'].create({
+            'zipcode': '99999',
+            'facility_name': 'Test Facility',
+            'facility_code': 'TST',
+        })
+        partner = self.env['res.partner'].create({
+            'name': 'Customer',
+            'zip': '99999',
+            'country_id': self.env.ref('base.es').id,
+        })
+        picking = self.env['stock.picking'].create({
+            'partner_id': partner.id,
+            'picking_type_id': self.env.ref('stock.picking_type_out').id,
+        })
+        self.assertEqual(picking._dhl_facility_code(), facility)
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+
+from openerp.tests.common import TransactionCase
+
+from ..generator.dhl_generator import DHLFileGenerator, DHLLine
+
+
+class TestDHLGenerator(TransactionCase):
+    """Test the DHL files."""
+
+    def setUp(self):
+        super(TestDHLGenerator, self).setUp()
+        self.partner = self.env['res.partner'].create({
+            'name': 'Customer',
+            'street': 'Calle Mayor 1',
+            'city': 'Madrid',
+            'zip': '28001',
+            'phone': '91-123 45.67',
+            'country_id': self.env.ref('base.es').id,
+        })
+
+    def _create_picking(self, tracking_ref):
+        return self.env['stock.picking'].create({
+            'partner_id': self.partner.id,
+            'picking_type_id': self.env.ref('stock.picking_type_out').id,
+            'carrier_tracking_ref': tracking_ref,
+        })
+
+    def test_rows(self):
+        """The phone of the customer is exported."""
+        picking = self._create_picking('1234')
+        configuration = self.env['delivery.carrier.file'].new({
+            'type': 'dhl_domestic_economy',
+            'dhl_account_code': '123',
+            'dhl_origin_station': '12',
+        })
+        generator = DHLFileGenerator('dhl_domestic_economy')
+        rows = generator._get_rows(picking, configuration)
+        self.assertEqual(len(rows), 1)
+        values = dict(zip(DHLLine().get_header(), rows[0]))
+        self.assertEqual(values['cptlfdes'], '911234567')
+        self.assertEqual(values['cocodcli'], '000123')
+        self.assertEqual(values['coexpe_ddd'], '00001234')
+        self.assertEqual(values['copade'], 'ES')
+
+    def test_chunked_files(self):
+        """The grouped file is split in numbered files with a manifest."""
+        pickings = (self._create_picking('1234') |
+                    self._create_picking('1235'))
+        configuration = self.env['delivery.carrier.file'].new({
+            'type': 'dhl_domestic_economy',
+            'dhl_account_code': '123',
+            'dhl_origin_station': '12',
+            'group_pickings': True,
+            'max_rows': 1,
+        })
+        manifest_dir = self.env.ref(
+            'delivery_carrier_file_dhl.dir_dhl_manifest')
+        generator = DHLFileGenerator('dhl_domestic_economy')
+        files = list(generator.generate_files(pickings, configuration))
+        self.assertEqual([picking_ids for __, __, picking_ids in files],
+                         [[pickings[0].id], [pickings[1].id]])
+        for number, (filename, file_content, __) in enumerate(files, 1):
+            self.assertTrue(filename.endswith('_%03d.EXP' % number))
+            self.assertEqual(len(file_content.read().splitlines()), 1)
+            file_content.close()
+            manifest = self.env['ir.attachment'].search([
+                ('parent_id', '=', manifest_dir.id),
+                ('name', '=', filename.replace('.EXP', '.csv')),
+            ])
+            self.assertEqual(len(manifest), 1)
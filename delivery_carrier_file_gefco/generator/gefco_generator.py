@@ -19,6 +19,8 @@
 #    along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
 ##############################################################################
+import itertools
+import operator
 import unicodedata
 from datetime import datetime
 from openerp.addons.base_delivery_carrier_files.generator import \
@@ -27,40 +29,9 @@ from openerp.addons.base_delivery_carrier_files.generator import \
 
 class GefcoBaseLine(BaseLine):
 
+    fixed_width = True
     zerofill_fields = []
 
-    def get_fields(self):
-        """
-        According to the class attribute "fields",
-        generate a row with all the value of the line.
-        If a width is defined on some fields,
-        their content is cut to their maximal length.
-
-        :return: a list of values for each field in the
-                 order of the class attribute "fields"
-        """
-        res = []
-        zerofill_fields = self.zerofill_fields or []
-        for field in self.fields:
-            field_name, width = self._field_definition(field)
-            if field_name:
-                value = getattr(self, field_name)
-                if value in (False, None):
-                    value = ''
-                elif not isinstance(value, (str, unicode)):
-                    value = unicode(value)
-                if width:
-                    value = value[0:width]
-                    if field_name in zerofill_fields:
-                        value = value.zfill(width)
-                    if width > len(value):
-                        need_width = width - len(value)
-                        value = u"{}{}".format(value, ' ' * need_width)
-            else:
-                value = ''
-            res.append(value)
-        return res
-
 
 class GefcoHeaderLine(GefcoBaseLine):
     fields = (
@@ -171,13 +142,33 @@ class GefcoPackageLine(GefcoBaseLine):
 
 class GefcoFileGenerator(CarrierFileGenerator):
 
+    prefetch_fields = ('origin',
+                       'carrier_tracking_ref',
+                       'number_of_packages',
+                       'weight',
+                       'partner_id.ref',
+                       'partner_id.name',
+                       'partner_id.street',
+                       'partner_id.street2',
+                       'partner_id.city',
+                       'partner_id.zip',
+                       'partner_id.phone',
+                       'partner_id.country_id.code',
+                       'picking_type_id.warehouse_id.partner_id.name',
+                       'picking_type_id.warehouse_id.partner_id.street',
+                       'picking_type_id.warehouse_id.partner_id.street2',
+                       'picking_type_id.warehouse_id.partner_id.city',
+                       'picking_type_id.warehouse_id.partner_id.zip',
+                       'picking_type_id.warehouse_id.partner_id.'
+                       'country_id.code')
+
     @classmethod
     def carrier_for(cls, carrier_name):
         return carrier_name == 'gefco'
 
     def _get_header_rows(self, pickings, configuration):
         ir_sequence_env = pickings.env['ir.sequence']
-        manifest_number = ir_sequence_env.next_by_id(
+        manifest_number = ir_sequence_env.next_by_id_reserved(
             configuration.gefco_manifest_sequence.id)
         header_line = GefcoHeaderLine()
         header_line.header_id = "H1"
@@ -197,7 +188,7 @@ class GefcoFileGenerator(CarrierFileGenerator):
         ir_sequence_env = picking.env['ir.sequence']
         picking_sequence = picking.carrier_tracking_ref
         if not picking_sequence:
-            picking_sequence = ir_sequence_env.next_by_id(
+            picking_sequence = ir_sequence_env.next_by_id_reserved(
                 configuration.gefco_picking_sequence.id)
             picking.write({'carrier_tracking_ref': picking_sequence})
         number_of_packages = picking.number_of_packages or 1
@@ -253,7 +244,7 @@ class GefcoFileGenerator(CarrierFileGenerator):
         detail_line.shipper_city = wh_partner_id.city or ''
         detail_line.shipper_zipcode = wh_partner_id.zip or ''
         detail_line.shipper_country_code = wh_partner_id.country_id.code or ''
-        packages_lines = []
+        package_records = []
         for package_number in range(number_of_packages):
             package_line = GefcoPackageLine()
             package_code = "{}{}".format(
@@ -261,9 +252,12 @@ class GefcoFileGenerator(CarrierFileGenerator):
             package_line.package_record_id = "PCI"
             package_line.shipper_parcel_number = package_code
             package_line.handling_unit_number = package_code
-            packages_lines.append(package_line.get_fields())
+            package_records.append(package_line)
 
-        picking_lines = [detail_line.get_fields()] + packages_lines
+        # the package lines are already formatted, one cell per row
+        picking_lines = [detail_line.get_fields()]
+        picking_lines += [[line] for line in
+                          GefcoPackageLine.format_rows(package_records)]
 
         return picking_lines
 
@@ -271,18 +265,16 @@ class GefcoFileGenerator(CarrierFileGenerator):
         """
         Write the rows in the file (file_handle)
 
-        :param StringIO file_handle: file to write in
+        :param file file_handle: file-like object to write in
         :param rows: rows to write in the file
         :param browse_record configuration: configuration of the file to
                generate
-        :return: the file_handle as StringIO with the rows written in it
+        :return: the file_handle with the rows written in it
         """
-        row_text = ""
         for row in rows:
-            row_text += u"{}\n".format("".join(row))
-        row_text = unicodedata.normalize('NFKD', row_text).encode(
-            'ascii', 'ignore')
-        file_handle.write(row_text)
+            row_text = u"{}\n".format("".join(row))
+            file_handle.write(unicodedata.normalize('NFKD', row_text).encode(
+                'ascii', 'ignore'))
         return file_handle
 
     def generate_files(self, pickings, configuration):
@@ -307,9 +299,10 @@ class GefcoFileGenerator(CarrierFileGenerator):
         for picking in pickings:
             filename = self._get_filename_single(picking, configuration)
             filename = self.sanitize_filename(filename)
-            rows = self._get_header_rows(picking, configuration)
-            rows += self._get_rows(picking, configuration)
-            file_content = self._get_file(rows, configuration)
+            rows = itertools.chain(
+                self._get_header_rows(picking, configuration),
+                self._get_rows(picking, configuration))
+            file_content = self._get_file_stream(rows, configuration)
             files.append((filename, file_content, [picking.id]))
             # Generate manifest
         return files
@@ -328,12 +321,47 @@ class GefcoFileGenerator(CarrierFileGenerator):
                  [('filename1', file, [picking ids]),
                   ('filename2', file2, [picking ids])]
         """
+        if configuration.max_rows or configuration.max_bytes:
+            return self._generate_files_chunked(pickings, configuration)
         files = []
-        rows = self._get_header_rows(pickings, configuration)
         filename = self._get_filename_grouped(configuration)
         filename = self.sanitize_filename(filename)
-        for picking in pickings:
-            rows += self._get_rows(picking, configuration)
-        file_content = self._get_file(rows, configuration)
+        rows = itertools.chain(
+            self._get_header_rows(pickings, configuration),
+            self._iter_rows(pickings, configuration))
+        file_content = self._get_file_stream(rows, configuration)
         files.append((filename, file_content, [p.id for p in pickings]))
         return files
+
+    def _generate_files_chunked(self, pickings, configuration):
+        """
+        Generate the grouped files of the pickings in numbered chunks,
+        each chunk being a manifest with its own header line.
+
+        :param browse_record pickings: list of browsable pickings records
+        :param browse_record configuration: configuration of
+                                            the file to generate
+        :return: iterator of tuple with files to create like:
+                 ('filename_001', file, [picking ids]),
+                 ('filename_002', file2, [picking ids])
+        """
+        # the header line is counted in the limits of each chunk
+        header_bytes = sum(width for __, width, __
+                           in GefcoHeaderLine._layout) + 1
+        chunks = itertools.groupby(
+            self._iter_chunked_rows(pickings, configuration,
+                                    header_rows=1,
+                                    header_bytes=header_bytes),
+            key=operator.itemgetter(0))
+        for number, chunk in chunks:
+            chunk = list(chunk)
+            chunk_pickings = pickings.browse(
+                [picking.id for __, picking, __, __ in chunk])
+            filename = self._get_filename_chunk(configuration, number)
+            filename = self.sanitize_filename(filename)
+            rows = itertools.chain(
+                self._get_header_rows(chunk_pickings, configuration),
+                itertools.chain.from_iterable(
+                    picking_rows for __, __, picking_rows, __ in chunk))
+            file_content = self._get_file_stream(rows, configuration)
+            yield (filename, file_content, chunk_pickings.ids)
@@ -19,14 +19,42 @@
 #    along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
 ##############################################################################
-from openerp import models, fields
+from openerp import models, fields, api, tools
 
 
 class GefcoDestination(models.Model):
     _name = 'gefco.destination'
+    _inherit = 'delivery.carrier.cache.mixin'
 
     country_id = fields.Many2one('res.country', 'Destination Country',
                                  required=True, index=True)
     zip_code = fields.Char('Zip Code', required=True, index=True)
     directional_code = fields.Char('Directional Code', required=True)
     destination_code = fields.Char('Destination Code')
+
+    @tools.ormcache(skiparg=3)
+    def _get_destination_index(self, cr, uid):
+        """ Index of the destinations by (country id, zip code)
+
+        Cached per registry, the cache is cleared when the destinations
+        are modified.
+
+        :return: dict {(country id, zip code): (directional code,
+                 destination code)}
+        """
+        cr.execute("SELECT country_id, zip_code, directional_code, "
+                   "       destination_code "
+                   "FROM gefco_destination "
+                   "ORDER BY id DESC")
+        # the oldest destination wins when a key is defined twice
+        return dict(((country_id, zip_code), (directional, destination))
+                    for country_id, zip_code, directional, destination
+                    in cr.fetchall())
+
+    @api.model
+    def get_destination_codes(self, country_id, zip_code):
+        """ Return the (directional code, destination code) of a
+        destination or (False, False) when there is none
+        """
+        index = self._get_destination_index()
+        return index.get((country_id, zip_code), (False, False))
@@ -83,19 +83,15 @@ class StockPicking(models.Model):
 
         carrier_tracking_ref = self.carrier_tracking_ref
         if not carrier_tracking_ref:
-            carrier_tracking_ref = ir_sequence_env.next_by_id(
+            carrier_tracking_ref = ir_sequence_env.next_by_id_reserved(
                 gefco_configuration.gefco_picking_sequence.id)
             self.write({'carrier_tracking_ref': carrier_tracking_ref})
 
-        gefco_destination = gefco_destination_env.search([
-            ('country_id', '=', self.partner_id.country_id.id),
-            ('zip_code', '=', self.partner_id.zip)
-        ])
-        directional_code = ''
-        destination_code = ''
-        if gefco_destination:
-            directional_code = gefco_destination.directional_code
-            destination_code = gefco_destination.destination_code
+        directional_code, destination_code = (
+            gefco_destination_env.get_destination_codes(
+                self.partner_id.country_id.id, self.partner_id.zip))
+        directional_code = directional_code or ''
+        destination_code = destination_code or ''
 
         pickup_datetime = datetime.strptime(self.date_done,
                                             DEFAULT_SERVER_DATETIME_FORMAT)
@@ -0,0 +1,2 @@
+from . import test_gefco_generator
+from . import test_destination_import
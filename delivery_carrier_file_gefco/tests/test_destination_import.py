@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+
+import mock
+
+from openerp import exceptions
+from openerp.tests.common import TransactionCase
+
+
+class TestDestinationImport(TransactionCase):
+    """Test the import of the Gefco destinations."""
+
+    def _import(self, destinations, user=None):
+        wizard_obj = self.env['gefco.destination.config.wizard'].sudo(
+            user or self.env.user)
+        with mock.patch.object(type(wizard_obj), '_read_destination_data',
+                               autospec=True, return_value=destinations):
+            wizard_obj.create({}).import_destination_data()
+
+    def _destination(self, zip_code):
+        return self.env['gefco.destination'].search(
+            [('country_id', '=', self.spain.id),
+             ('zip_code', '=', zip_code)])
+
+    def setUp(self):
+        super(TestDestinationImport, self).setUp()
+        self.spain = self.env.ref('base.es')
+        destination_obj = self.env['gefco.destination']
+        self.unchanged = destination_obj.create({
+            'country_id': self.spain.id,
+            'zip_code': '28001',
+            'directional_code': 'A',
+            'destination_code': '1',
+        })
+        self.changed = destination_obj.create({
+            'country_id': self.spain.id,
+            'zip_code': '28002',
+            'directional_code': 'B',
+            'destination_code': '2',
+        })
+        self.env.cr.execute(
+            "UPDATE gefco_destination "
+            "SET write_date = '2000-01-01 00:00:00', write_uid = %s "
+            "WHERE id IN %s",
+            (self.ref('base.user_root'),
+             tuple((self.unchanged | self.changed).ids)))
+        destination_obj.invalidate_cache()
+        # cache the index, it must be cleared by the import
+        destination_obj.get_destination_codes(self.spain.id, '28002')
+
+    def test_import(self):
+        """New rows are created, changed ones updated, others kept."""
+        user = self.env['res.users'].create({
+            'name': 'Test sales manager',
+            'login': 'test_gefco_import',
+            'groups_id': [(6, 0, [self.ref('base.group_sale_manager')])],
+        })
+        self._import({('ES', '28001'): (u'A', u'1'),
+                      ('ES', '28002'): (u'C', u'3'),
+                      ('ES', '28003'): (u'D', None),
+                      }, user=user)
+        self.assertEqual(self.unchanged.write_date, '2000-01-01 00:00:00')
+        self.assertEqual(self.changed.directional_code, 'C')
+        self.assertEqual(self.changed.destination_code, '3')
+        self.assertEqual(self.changed.write_uid, user)
+        self.assertNotEqual(self.changed.write_date, '2000-01-01 00:00:00')
+        created = self._destination('28003')
+        self.assertEqual(len(created), 1)
+        self.assertEqual(created.directional_code, 'D')
+        self.assertFalse(created.destination_code)
+        self.assertEqual(created.create_uid, user)
+        self.assertEqual(created.write_uid, user)
+        self.assertTrue(created.create_date)
+        self.assertTrue(created.write_date)
+        destination_obj = self.env['gefco.destination']
+        self.assertEqual(
+            destination_obj.get_destination_codes(self.spain.id, '28002'),
+            ('C', '3'))
+        self.assertEqual(
+            destination_obj.get_destination_codes(self.spain.id, '28003'),
+            ('D', None))
+
+    def test_import_unknown_country(self):
+        """The import is refused when a country is unknown."""
+        with self.assertRaises(exceptions.Warning):
+            self._import({('XX', '00001'): (u'A', None)})
+        self.assertFalse(self.env['gefco.destination'].search(
+            [('zip_code', '=', '00001')]))
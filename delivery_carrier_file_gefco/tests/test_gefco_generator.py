@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+
+import mock
+import unittest2
+
+from ..generator.gefco_generator import GefcoFileGenerator
+
+
+class TestGefcoGenerator(unittest2.TestCase):
+    """Test the split of the Gefco manifests in chunks."""
+
+    def test_chunked_manifests(self):
+        """Each chunk has its header, counted in the limits."""
+        generator = GefcoFileGenerator('gefco')
+        pickings = mock.MagicMock()
+        pickings.__iter__.return_value = [mock.Mock(id=picking_id)
+                                          for picking_id in (1, 2, 3)]
+        pickings.browse.side_effect = lambda ids: mock.Mock(ids=ids)
+        configuration = mock.Mock(max_rows=2, max_bytes=0)
+
+        def get_rows(picking, configuration):
+            return [['RDE%d' % picking.id]]
+
+        def get_header_rows(pickings, configuration):
+            return [['H1 %d' % len(pickings.ids)]]
+
+        with mock.patch.object(generator, '_get_rows',
+                               side_effect=get_rows), \
+                mock.patch.object(generator, '_get_header_rows',
+                                  side_effect=get_header_rows), \
+                mock.patch.object(generator, '_get_filename_grouped',
+                                  return_value='gefco.txt'):
+            files = list(generator._generate_files_chunked(pickings,
+                                                           configuration))
+        self.assertEqual(
+            [(filename, picking_ids) for filename, __, picking_ids in files],
+            [('gefco_001.txt', [1]),
+             ('gefco_002.txt', [2]),
+             ('gefco_003.txt', [3])])
+        self.assertEqual(files[0][1].read(), 'H1 1\nRDE1\n')
@@ -22,38 +22,106 @@
 import os
 import csv
 from openerp import models, api, exceptions
+from openerp.tools import split_every
+
+# number of destinations inserted or updated by query
+IMPORT_CHUNK_SIZE = 1000
 
 
 class GefcoDestinationConfigWizard(models.TransientModel):
     _name = 'gefco.destination.config.wizard'
 
-    @api.multi
-    def import_destination_data(self):
-        gefco_destination_env = self.env['gefco.destination']
-        country_env = self.env['res.country']
+    @api.model
+    def _read_destination_data(self):
+        """ Read the destinations of the data file
+
+        :return: dict {(country code, zip code): (directional code,
+                 destination code)}, the last row wins for a key
+        """
         data_path = os.path.join(
             os.path.dirname(os.path.abspath(__file__)), '..', 'data')
         gefco_destination_file = os.path.join(data_path,
                                               'gefco_destination_codes.csv')
+        destinations = {}
         with open(gefco_destination_file, 'rb') as csvfile:
             csvreader = csv.DictReader(csvfile, delimiter=',', quotechar='"')
             for row in csvreader:
-                country = country_env.search([
-                    ('code', '=', row['country_id'])
-                ])
-                if not country:
-                    raise exceptions.Warning("Country {} not found".format(
-                        row['country_id']))
-                zip_code = row['zip_code'].zfill(5)
-                destination = gefco_destination_env.search([
-                    ('country_id', '=', country.id),
-                    ('zip_code', '=', zip_code)
-                ])
-                if not destination:
-                    gefco_destination_env.create({
-                        'country_id': country.id,
-                        'zip_code': zip_code,
-                        'directional_code': row['directional_code'],
-                        'destination_code': row['destination_code']
-                    })
+                key = (row['country_id'], row['zip_code'].zfill(5))
+                # stored like the ORM does, empty codes are NULL
+                destinations[key] = tuple(
+                    row[name].decode('utf-8') or None
+                    for name in ('directional_code', 'destination_code'))
+        return destinations
+
+    @api.multi
+    def import_destination_data(self):
+        """ Create the missing destinations and update the changed ones
+
+        The countries and the existing destinations are read once and
+        the destinations are inserted and updated by chunks of queries,
+        the data file holds more than 100000 destinations.
+        """
+        cr = self.env.cr
+        uid = self.env.uid
+        destination_obj = self.env['gefco.destination']
+        # the rows are written behind the ORM
+        destination_obj.check_access_rights('create')
+        destination_obj.check_access_rights('write')
+        destinations = self._read_destination_data()
+
+        cr.execute("SELECT code, id FROM res_country")
+        country_ids = dict(cr.fetchall())
+        missing = set(code for code, __ in destinations
+                      if code not in country_ids)
+        if missing:
+            raise exceptions.Warning("Country {} not found".format(
+                ', '.join(sorted(missing))))
+
+        cr.execute("SELECT id, country_id, zip_code, directional_code, "
+                   "       destination_code "
+                   "FROM gefco_destination")
+        existing = {}
+        for dest_id, country_id, zip_code, directional, code in cr.fetchall():
+            existing[(country_id, zip_code)] = (dest_id, directional, code)
+
+        to_create = []
+        to_update = []
+        for (country_code, zip_code), codes in destinations.iteritems():
+            country_id = country_ids[country_code]
+            current = existing.get((country_id, zip_code))
+            if current is None:
+                to_create.append((country_id, zip_code) + codes)
+            elif current[1:] != codes:
+                to_update.append((current[0],) + codes)
+
+        for chunk in split_every(IMPORT_CHUNK_SIZE, to_create):
+            values = ', '.join(
+                ["(%s, %s, %s, %s, %s, now() at time zone 'UTC', "
+                 "%s, now() at time zone 'UTC')"] * len(chunk))
+            params = []
+            for row in chunk:
+                params.extend(row + (uid, uid))
+            cr.execute("INSERT INTO gefco_destination "
+                       "(country_id, zip_code, directional_code, "
+                       " destination_code, create_uid, create_date, "
+                       " write_uid, write_date) "
+                       "VALUES " + values, params)
+
+        for chunk in split_every(IMPORT_CHUNK_SIZE, to_update):
+            values = ', '.join(['(%s, %s, %s)'] * len(chunk))
+            params = [uid]
+            for row in chunk:
+                params.extend(row)
+            cr.execute("UPDATE gefco_destination d "
+                       "SET directional_code = v.directional_code, "
+                       "    destination_code = v.destination_code, "
+                       "    write_uid = %s, "
+                       "    write_date = now() at time zone 'UTC' "
+                       "FROM (VALUES " + values + ") "
+                       "AS v (id, directional_code, destination_code) "
+                       "WHERE d.id = v.id", params)
+
+        if to_create or to_update:
+            destination_obj.invalidate_cache()
+            destination_obj.clear_caches()
         return True
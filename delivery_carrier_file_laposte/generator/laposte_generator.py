@@ -54,6 +54,20 @@ class LaPosteLine(BaseLine):
 
 class LaPosteFileGenerator(CarrierFileGenerator):
 
+    prefetch_fields = ('name',
+                       'weight',
+                       'address_id.name',
+                       'address_id.street',
+                       'address_id.street2',
+                       'address_id.zip',
+                       'address_id.city',
+                       'address_id.phone',
+                       'address_id.mobile',
+                       'address_id.email',
+                       'address_id.country_id.code',
+                       'address_id.partner_id.name',
+                       'address_id.partner_id.title')
+
     @classmethod
     def carrier_for(cls, carrier_name):
         return carrier_name == 'la_poste'
@@ -90,7 +104,7 @@ class LaPosteFileGenerator(CarrierFileGenerator):
             line.street2 = address.street2
             line.zip = address.zip
             line.city = address.city
-            line.country = address.country_id.code
+            line.country_code = address.country_id.code
             line.phone = address.phone or picking.address_id.mobile
             line.mail = address.email
         line.weight = "%.2f" % (picking.weight,)
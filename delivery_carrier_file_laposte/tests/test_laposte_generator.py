@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+
+import mock
+import unittest2
+
+from ..generator.laposte_generator import LaPosteFileGenerator, LaPosteLine
+
+
+class TestLaPosteGenerator(unittest2.TestCase):
+    """Test the rows of the La Poste files."""
+
+    def test_rows(self):
+        """The country code of the address is exported."""
+        address = mock.Mock(street='1 rue de la Gare',
+                            street2=False,
+                            zip='75001',
+                            city='Paris',
+                            phone='0102030405',
+                            email='customer@example.com')
+        address.name = 'Customer'
+        address.country_id.code = 'FR'
+        address.partner_id.title = False
+        picking = mock.Mock(weight=1.5, address_id=address)
+        picking.name = 'OUT/0001'
+        generator = LaPosteFileGenerator('la_poste')
+        rows = generator._get_rows(picking, mock.Mock())
+        self.assertEqual(len(rows), 1)
+        values = dict(zip(LaPosteLine().get_header(), rows[0]))
+        self.assertEqual(values['country_code'], 'FR')
+        self.assertEqual(values['reference'], 'OUT/0001')
+        self.assertEqual(values['weight'], '1.50')
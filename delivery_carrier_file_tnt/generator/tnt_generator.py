@@ -51,6 +51,23 @@ class TNTLine(BaseLine):
 
 class TNTFileGenerator(CarrierFileGenerator):
 
+    prefetch_fields = ('name',
+                       'carrier_id.name',
+                       'address_id.name',
+                       'address_id.street',
+                       'address_id.street2',
+                       'address_id.zip',
+                       'address_id.city',
+                       'address_id.phone',
+                       'address_id.mobile',
+                       'address_id.fax',
+                       'address_id.email',
+                       'address_id.state_id.name',
+                       'address_id.country_id.code',
+                       'address_id.country_id.name',
+                       'address_id.partner_id.name',
+                       'address_id.partner_id.vat')
+
     @classmethod
     def carrier_for(cls, carrier_name):
         return carrier_name == 'tnt_express_shipper'
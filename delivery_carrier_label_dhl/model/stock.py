@@ -134,7 +134,7 @@ class StockPicking(models.Model):
         tracking_number = dhl_shipment_request.tracking_numbers[0]
         file_extension = dhl_config.label_type.lower()
         label = {
-            'file': str(dhl_shipment_request.label_bytes).decode('base64'),
+            'file_base64': str(dhl_shipment_request.label_bytes),
             'file_type': file_extension,
             'name': "{}.{}".format(tracking_number, file_extension)
         }
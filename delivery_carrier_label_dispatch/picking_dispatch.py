@@ -71,12 +71,9 @@ class PickingDispatch(Model):
             # module that depend of delivery base can hide some field
             # depending of the type or the code
 
-            default_option_ids = []
-            available_option_ids = []
-            for available_option in carrier.available_option_ids:
-                available_option_ids.append(available_option.id)
-                if available_option.mandatory or available_option.by_default:
-                    default_option_ids.append(available_option.id)
+            # cached per carrier
+            default_option_ids = carrier.default_options().ids
+            available_option_ids = carrier.available_option_ids.ids
             res = {
                 'value': {'carrier_type': carrier.type,
                           'carrier_code': carrier.code,
@@ -233,8 +233,7 @@ class StockPicking(models.Model):
                 TrackingIds[0].TrackingNumber
             for package_response in completed_shipment.CompletedPackageDetails:
                 label = {
-                    'file': str(package_response.Label.Parts[0].Image).decode(
-                        'base64'),
+                    'file_base64': str(package_response.Label.Parts[0].Image),
                     'file_type': label_extension,
                     'name': "{}.{}".format(
                         package_response.TrackingIds[0].TrackingNumber,
@@ -70,7 +70,11 @@ class StockPicking(models.Model):
         self.ensure_one()
         self.set_pack_weight()
         if self.company_id.gls_generate_label:
-            self.generate_labels()
+            if self._use_label_queue(self.carrier_type):
+                # do not block the transfer while GLS answers
+                self.generate_labels_async()
+            else:
+                self.generate_labels()
 
     @api.multi
     def _customize_gls_picking(self):
@@ -260,36 +264,69 @@ class StockPicking(models.Model):
             raise UserError(e.message)
         return result
 
+    @api.multi
+    def _get_gls_service(self, sender):
+        self.ensure_one()
+        # gls has a rescue label without webservice required
+        # if webservice is down
+        # rescue label is also used for international carrier
+        test = False
+        if self.company_id.gls_test:
+            test = True
+        try:
+            _logger.info(
+                "Connecting to GLS web service")
+            service = GLSLabel(
+                sender, self.carrier_code, test_plateform=test)
+        except InvalidMissingField as e:
+            raise_exception(e.message)
+        except Exception as e:
+            raise_exception(e.message)
+        return service
+
     @api.multi
     def generate_shipping_labels(self, package_ids=None):
         """ Add label generation for GLS """
         self.ensure_one()
         if self.carrier_type == 'gls':
             sender = self._prepare_sender_gls()
-            # gls has a rescue label without webservice required
-            # if webservice is down
-            # rescue label is also used for international carrier
-            test = False
-            if self.company_id.gls_test:
-                test = True
-            try:
-                _logger.info(
-                    "Connecting to GLS web service")
-                service = GLSLabel(
-                    sender, self.carrier_code, test_plateform=test)
-            except InvalidMissingField as e:
-                raise_exception(e.message)
-            except Exception as e:
-                raise_exception(e.message)
+            service = self._get_gls_service(sender)
             self._check_existing_shipping_label()
             return self._generate_gls_labels(
                 service, packages=package_ids)
         return (super(StockPicking, self)
                 .generate_shipping_labels(package_ids=package_ids))
 
+    @api.multi
+    def generate_shipping_labels_batch(self, package_ids=None):
+        """ Add batch label generation for GLS
+
+        The existing labels and the packages of all the pickings are
+        read at once, and one GLS service is used per sender.
+
+        """
+        if self[:1].carrier_type != 'gls':
+            return (super(StockPicking, self)
+                    .generate_shipping_labels_batch(package_ids=package_ids))
+        self._check_existing_shipping_labels()
+        packages_by_picking = self._get_packages_from_pickings(
+            package_ids=package_ids)
+        services = {}
+        labels = {}
+        for picking in self:
+            sender = picking._prepare_sender_gls()
+            key = (tuple(sorted(sender.items())),
+                   picking.carrier_code,
+                   picking.company_id.gls_test)
+            if key not in services:
+                services[key] = picking._get_gls_service(sender)
+            labels[picking.id] = picking._generate_gls_labels(
+                services[key], packages=packages_by_picking[picking.id])
+        return labels
+
     @api.model
     def _get_sequence(self, label_name):
-        sequence = self.env['ir.sequence'].next_by_code(
+        sequence = self.env['ir.sequence'].next_by_code_reserved(
             'stock.picking_%s' % label_name)
         if not sequence:
             raise UserError(
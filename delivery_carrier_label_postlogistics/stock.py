@@ -62,15 +62,23 @@ class StockPicking(models.Model):
 
     @api.multi
     def _generate_postlogistics_label(self, webservice_class=None,
-                                      package_ids=None):
-        """ Generate labels and write tracking numbers received """
+                                      package_ids=None, packages=None,
+                                      web_service=None):
+        """ Generate labels and write tracking numbers received
+
+        :param packages: optional packages of the picking, already read
+                         by the caller
+        :param web_service: optional web service to reuse
+        """
         self.ensure_one()
         user = self.env.user
         company = user.company_id
         if webservice_class is None:
             webservice_class = PostlogisticsWebService
 
-        if package_ids is None:
+        if packages is not None:
+            packages = sorted(packages, key=attrgetter('name'))
+        elif package_ids is None:
             packages = self._get_packages_from_picking()
             packages = sorted(packages, key=attrgetter('name'))
         else:
@@ -78,7 +86,8 @@ class StockPicking(models.Model):
             package_obj = self.env['stock.quant.package']
             packages = package_obj.browse(package_ids)
 
-        web_service = webservice_class(company)
+        if web_service is None:
+            web_service = webservice_class(company)
         res = web_service.generate_label(self,
                                          packages,
                                          user_lang=user.lang)
@@ -88,7 +97,7 @@ class StockPicking(models.Model):
 
         def info_from_label(label):
             tracking_number = label['tracking_number']
-            return {'file': label['binary'].decode('base64'),
+            return {'file_base64': label['binary'],
                     'file_type': label['file_type'],
                     'name': tracking_number + '.' + label['file_type'],
                     }
@@ -127,6 +136,29 @@ class StockPicking(models.Model):
         _super = super(StockPicking, self)
         return _super.generate_shipping_labels(package_ids=package_ids)
 
+    @api.multi
+    def generate_shipping_labels_batch(self, package_ids=None):
+        """ Add batch label generation for Postlogistics
+
+        The packages of all the pickings are read at once and the web
+        service is connected only once.
+
+        """
+        if self[:1].carrier_id.type != 'postlogistics':
+            _super = super(StockPicking, self)
+            return _super.generate_shipping_labels_batch(
+                package_ids=package_ids)
+        web_service = PostlogisticsWebService(self.env.user.company_id)
+        packages_by_picking = self._get_packages_from_pickings(
+            package_ids=package_ids)
+        labels = {}
+        for picking in self:
+            labels[picking.id] = picking._generate_postlogistics_label(
+                package_ids=package_ids,
+                packages=packages_by_picking[picking.id],
+                web_service=web_service)
+        return labels
+
 
 class ShippingLabel(models.Model):
     """ Child class of ir attachment to identify which are labels """
@@ -59,7 +59,7 @@ class StockPicking(models.Model):
         (('1', 'Frecuencia 1'), ('2', 'Frecuencia 2')), string='Mrw Frequence')
 
     @api.multi
-    def _mrw_transm_envio_request(self, mrw_api):
+    def _mrw_transm_envio_request(self, mrw_api, packages=None):
         self.ensure_one()
         client = mrw_api.client
         transm_envio = client.factory.create('TransmEnvioRequest')
@@ -106,7 +106,7 @@ class StockPicking(models.Model):
         service_data.Referencia = self.name
         service_data.EnFranquicia = 'N'
         service_data.CodigoServicio = self.mrw_service_type
-        service_data.NumeroBultos = self.number_of_packages or 1
+        service_data.NumeroBultos = self._get_number_of_parcels(packages)
         service_data.Peso = self.weight or 1
         if self.mrw_frequence:
             service_data.Frecuencia = self.mrw_frequence
@@ -140,7 +140,15 @@ class StockPicking(models.Model):
         return label_factory
 
     @api.multi
-    def _generate_mrw_label(self, package_ids=None):
+    def _generate_mrw_label(self, package_ids=None, mrw_api=None,
+                            packages=None):
+        """ Generate the MRW label of the picking
+
+        :param mrw_api: optional ``MrwEnvio`` session to reuse, a new one
+                        is opened when None
+        :param packages: optional packages of the picking, read by
+                         the batch
+        """
         self.ensure_one()
         if not self.carrier_id.mrw_config_id:
             raise exceptions.Warning(_('No MRW Config defined in carrier'))
@@ -148,9 +156,11 @@ class StockPicking(models.Model):
             raise exceptions.Warning(
                 _('Please define an address in the %s warehouse') % (
                     self.warehouse_id.name))
-        mrw_api = MrwEnvio(self.carrier_id.mrw_config_id)
+        if mrw_api is None:
+            mrw_api = MrwEnvio(self.carrier_id.mrw_config_id)
         client = mrw_api.client
-        transm_envio = self._mrw_transm_envio_request(mrw_api)
+        transm_envio = self._mrw_transm_envio_request(mrw_api,
+                                                      packages=packages)
 
         response = client.service.TransmEnvio(transm_envio)
 
@@ -166,7 +176,7 @@ class StockPicking(models.Model):
             raise exceptions.Warning(response.Mensaje)
 
         label = {
-            'file': label_response.EtiquetaFile.decode('base64'),
+            'file_base64': label_response.EtiquetaFile,
             'file_type': 'pdf',
             'name': response.NumeroEnvio + '.pdf',
         }
@@ -204,3 +214,23 @@ class StockPicking(models.Model):
             return self._generate_mrw_label(package_ids=package_ids)
         return super(StockPicking, self).generate_shipping_labels(
             package_ids=package_ids)
+
+    @api.multi
+    def generate_shipping_labels_batch(self, package_ids=None):
+        """ Open one MRW session per configuration for the whole batch """
+        if self[:1].carrier_id.type != 'mrw':
+            return super(StockPicking, self).generate_shipping_labels_batch(
+                package_ids=package_ids)
+        packages_by_picking = self._get_packages_from_pickings(
+            package_ids=package_ids)
+        sessions = {}
+        labels = {}
+        for pick in self:
+            mrw_config = pick.carrier_id.mrw_config_id
+            if mrw_config and mrw_config.id not in sessions:
+                sessions[mrw_config.id] = MrwEnvio(mrw_config)
+            labels[pick.id] = pick._generate_mrw_label(
+                package_ids=package_ids,
+                mrw_api=sessions.get(mrw_config.id),
+                packages=packages_by_picking[pick.id])
+        return labels
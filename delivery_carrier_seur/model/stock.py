@@ -85,7 +85,18 @@ class StockPicking(models.Model):
         self.seur_product_code = carrier.seur_product_code
 
     @api.multi
-    def _generate_seur_label(self, package_ids=None):
+    def _generate_seur_label(self, package_ids=None, seur_picking=None,
+                             tracking_refs=None, packages=None):
+        """ Generate the SEUR label of the picking
+
+        :param seur_picking: optional connected ``seur.picking.Picking``
+                             to reuse, a new one is opened when None
+        :param tracking_refs: optional dict collecting the tracking
+                              references by picking id, the reference is
+                              written on the picking when None
+        :param packages: optional packages of the picking, read by
+                         the batch
+        """
         self.ensure_one()
         if not self.carrier_id.seur_config_id:
             raise exceptions.Warning(_('No SEUR Config defined in carrier'))
@@ -95,7 +106,33 @@ class StockPicking(models.Model):
                     self.warehouse_id.name))
 
         config = self.carrier_id.seur_config_id
+        if seur_picking is None:
+            seur_picking = self._seur_connection(config)
 
+        data = self._get_label_data(packages=packages)
+        tracking_ref, label, error = seur_picking.create(data)
+
+        if error:
+            raise exceptions.Warning(
+                _('Error sending label to SEUR\n%s') % error)
+
+        if tracking_refs is None:
+            self.carrier_tracking_ref = tracking_ref
+        else:
+            tracking_refs[self.id] = tracking_ref
+
+        label_info = {
+            'name': self.name + '_' + tracking_ref + '.' + config.file_type,
+            'file_type': config.file_type
+        }
+        if config.file_type == 'pdf':
+            label_info['file_base64'] = label
+        else:
+            label_info['file'] = label
+        return [label_info]
+
+    @api.model
+    def _seur_connection(self, config):
         seur_context = {
             'printer': 'ZEBRA',
             'printer_model': 'LP2844-Z',
@@ -124,26 +161,9 @@ class StockPicking(models.Model):
         except HTTPError, e:
             raise exceptions.Warning(
                 _('Error connecting with SEUR try later:\n%s') % e)
+        return seur_picking
 
-        data = self._get_label_data()
-        tracking_ref, label, error = seur_picking.create(data)
-
-        if error:
-            raise exceptions.Warning(
-                _('Error sending label to SEUR\n%s') % error)
-
-        self.carrier_tracking_ref = tracking_ref
-
-        if config.file_type == 'pdf':
-            label = label.decode('base64')
-
-        return [{
-            'name': self.name + '_' + tracking_ref + '.' + config.file_type,
-            'file': label,
-            'file_type': config.file_type
-        }]
-
-    def _get_label_data(self):
+    def _get_label_data(self, packages=None):
         partner = self.partner_id.parent_id or self.partner_id
         if not self.seur_service_code or not self.seur_product_code:
             raise exceptions.Warning(_(
@@ -163,7 +183,7 @@ class StockPicking(models.Model):
         data = {
             'servicio': unidecode(self.seur_service_code),
             'product': unidecode(self.seur_product_code),
-            'total_bultos': self.number_of_packages or '1',
+            'total_bultos': self._get_number_of_parcels(packages),
             'total_kilos': self.weight or '1',
             'peso_bulto': self.weight_net or '1',
             'observaciones': self.note and unidecode(self.note) or '',
@@ -206,3 +226,26 @@ class StockPicking(models.Model):
             return self._generate_seur_label(package_ids=package_ids)
         return super(StockPicking, self).generate_shipping_labels(
             package_ids=package_ids)
+
+    @api.multi
+    def generate_shipping_labels_batch(self, package_ids=None):
+        """ Connect to SEUR once per configuration for the whole batch """
+        if self[:1].carrier_id.type != 'seur':
+            return super(StockPicking, self).generate_shipping_labels_batch(
+                package_ids=package_ids)
+        packages_by_picking = self._get_packages_from_pickings(
+            package_ids=package_ids)
+        connections = {}
+        labels = {}
+        tracking_refs = {}
+        for pick in self:
+            config = pick.carrier_id.seur_config_id
+            if config and config.id not in connections:
+                connections[config.id] = self._seur_connection(config)
+            labels[pick.id] = pick._generate_seur_label(
+                package_ids=package_ids,
+                seur_picking=connections.get(config.id),
+                tracking_refs=tracking_refs,
+                packages=packages_by_picking[pick.id])
+        self._write_tracking_refs(tracking_refs)
+        return labels
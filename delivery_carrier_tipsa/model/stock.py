@@ -52,7 +52,18 @@ class StockPicking(models.Model):
         '_get_tipsa_service_type', string='Tipsa Service')
 
     @api.multi
-    def _generate_tipsa_label(self, package_ids=None):
+    def _generate_tipsa_label(self, package_ids=None, tipsa_ws=None,
+                              tracking_refs=None, packages=None):
+        """ Generate the Tipsa label of the picking
+
+        :param tipsa_ws: optional logged ``TipsaWebService`` to reuse,
+                         a new session is opened when None
+        :param tracking_refs: optional dict collecting the tracking
+                              references by picking id, the reference is
+                              written on the picking when None
+        :param packages: optional packages of the picking, read by
+                         the batch
+        """
         self.ensure_one()
         if not self.carrier_id.tipsa_config_id:
             raise exceptions.warning(_('No tipsa config defined in carrirer'))
@@ -63,10 +74,8 @@ class StockPicking(models.Model):
         warehouse_partner = self.picking_type_id.warehouse_id.partner_id
 
         tipsa_config = self.carrier_id.tipsa_config_id
-        tipsa_login = TipsaLogin(tipsa_config)
-        login_session = tipsa_login.session_code()
-        tipsa_ws = TipsaWebService(self.carrier_id.tipsa_config_id,
-                                   login_session)
+        if tipsa_ws is None:
+            tipsa_ws = self._tipsa_web_service(tipsa_config)
 
         warehouse_address = warehouse_partner.street or ''
         if warehouse_partner.street2:
@@ -93,7 +102,7 @@ class StockPicking(models.Model):
                 strCodCli=self.carrier_id.tipsa_config_id.customer_code,
                 dtFecha=datetime.now().isoformat(),
                 strCodTipoServ=self.tipsa_service_type,
-                intPaq=self.number_of_packages or 1,
+                intPaq=self._get_number_of_parcels(packages),
                 dPesoOri=self.weight or 1,
                 strNomOri=self.company_id.name,
                 strDirOri=warehouse_address,
@@ -122,20 +131,28 @@ class StockPicking(models.Model):
             raise exceptions.Warning(e.message)
 
         file_extension = tipsa_config.report_extension.lower()
-        if file_extension == 'txt':
-            file_contents = shipping_label.encode('utf-8')
-        else:
-            file_contents = shipping_label.decode('base64')
         label = {
-            'file': file_contents,
             'file_type': file_extension,
             'name': picking_ref + "." + file_extension,
         }
+        if file_extension == 'txt':
+            label['file'] = shipping_label.encode('utf-8')
+        else:
+            label['file_base64'] = shipping_label
 
-        self.write({'carrier_tracking_ref': picking_ref})
+        if tracking_refs is None:
+            self.write({'carrier_tracking_ref': picking_ref})
+        else:
+            tracking_refs[self.id] = picking_ref
 
         return [label]
 
+    @api.model
+    def _tipsa_web_service(self, tipsa_config):
+        tipsa_login = TipsaLogin(tipsa_config)
+        login_session = tipsa_login.session_code()
+        return TipsaWebService(tipsa_config, login_session)
+
     @api.multi
     def generate_shipping_labels(self, package_ids=None):
         """ Add label generation for Tipsa """
@@ -144,3 +161,27 @@ class StockPicking(models.Model):
             return self._generate_tipsa_label(package_ids=package_ids)
         return super(StockPicking, self).generate_shipping_labels(
             package_ids=package_ids)
+
+    @api.multi
+    def generate_shipping_labels_batch(self, package_ids=None):
+        """ Log in Tipsa once per configuration for the whole batch """
+        if self[:1].carrier_id.type != 'tipsa':
+            return super(StockPicking, self).generate_shipping_labels_batch(
+                package_ids=package_ids)
+        packages_by_picking = self._get_packages_from_pickings(
+            package_ids=package_ids)
+        sessions = {}
+        labels = {}
+        tracking_refs = {}
+        for pick in self:
+            tipsa_config = pick.carrier_id.tipsa_config_id
+            if tipsa_config and tipsa_config.id not in sessions:
+                sessions[tipsa_config.id] = self._tipsa_web_service(
+                    tipsa_config)
+            labels[pick.id] = pick._generate_tipsa_label(
+                package_ids=package_ids,
+                tipsa_ws=sessions.get(tipsa_config.id),
+                tracking_refs=tracking_refs,
+                packages=packages_by_picking[pick.id])
+        self._write_tracking_refs(tracking_refs)
+        return labels
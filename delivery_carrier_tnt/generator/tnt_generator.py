@@ -28,6 +28,11 @@ _logger = logging.getLogger(__name__)
 
 class TNTFileGenerator(CarrierFileGenerator):
 
+    prefetch_fields = ('notified2carrier',
+                       'lines_manifest',
+                       'datetime_label',
+                       'carrier_id.tnt_config_id.is_test')
+
     @classmethod
     def carrier_for(cls, carrier_name):
         return carrier_name == 'tnt'
@@ -45,19 +50,17 @@ class TNTFileGenerator(CarrierFileGenerator):
         """
         Write the rows in the file (file_handle)
 
-        :param StringIO file_handle: file to write in
+        :param file file_handle: file-like object to write in
         :param rows: rows to write in the file
         :param browse_record configuration: configuration of the file to
                generate
-        :return: the file_handle as StringIO with the rows written in it
+        :return: the file_handle with the rows written in it
         """
-        row_text = ""
         for row in rows:
             if row:
-                row_text += u"{}\n".format("".join(row))
-        row_text = unicodedata.normalize('NFKD', row_text).encode(
-            'ascii', 'ignore')
-        file_handle.write(row_text)
+                row_text = u"{}\n".format("".join(row))
+                file_handle.write(unicodedata.normalize(
+                    'NFKD', row_text).encode('ascii', 'ignore'))
         return file_handle
 
     def _tnt_filename(self, configuration):
@@ -65,7 +68,7 @@ class TNTFileGenerator(CarrierFileGenerator):
         formatted_date = date_now.strftime('%Y%m%d%H%M%S')
         company_name = configuration.tnt_company_name
         ir_sequence_env = configuration.env['ir.sequence']
-        file_sufix_number = ir_sequence_env.next_by_id(
+        file_sufix_number = ir_sequence_env.next_by_id_reserved(
             configuration.tnt_filename_sequence.id)
         contador = file_sufix_number.zfill(4)
         return "FD6CNFF_{}_{}.{}".format(
@@ -77,6 +80,11 @@ class TNTFileGenerator(CarrierFileGenerator):
     def _get_filename_single(self, picking, configuration, extension='csv'):
         return self._tnt_filename(configuration)
 
+    def _get_filename_chunk(self, configuration, number):
+        # the sequence number is the suffix of the file, each chunk
+        # takes its own number
+        return self._tnt_filename(configuration)
+
     def generate_files(self, pickings, configuration):
         res = super(TNTFileGenerator, self).generate_files(
             pickings, configuration)
@@ -130,10 +130,14 @@ class StockPicking(models.Model):
         lines_manifest = ''
         self.ensure_one()
         res = ''
-        consigment_code = self.env['ir.sequence'].get(
-            'tnt.consignment.sequence')
-        if consigment_code > self.carrier_id.tnt_config_id.max_range_code or \
-                consigment_code < self.carrier_id.tnt_config_id.min_range_code:
+        tnt_config = self.carrier_id.tnt_config_id
+        max_range_code = tnt_config.max_range_code or ''
+        consigment_code = self.env['ir.sequence'].next_by_code_reserved(
+            'tnt.consignment.sequence',
+            max_number=int(max_range_code) if max_range_code.isdigit()
+            else None)
+        if consigment_code > tnt_config.max_range_code or \
+                consigment_code < tnt_config.min_range_code:
 
             raise exceptions.Warning(_(
                 'Invalid consigment code for TNT Range'
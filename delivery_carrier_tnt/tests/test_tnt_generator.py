@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+
+import mock
+import unittest2
+
+from ..generator.tnt_generator import TNTFileGenerator
+
+
+class TestTNTGenerator(unittest2.TestCase):
+    """Test the names of the TNT files."""
+
+    def test_chunk_filename(self):
+        """Each chunk takes its own number of the sequence."""
+        configuration = mock.MagicMock(max_rows=1, max_bytes=0,
+                                       tnt_company_name='CO')
+        sequence_model = configuration.env.__getitem__.return_value
+        sequence_model.next_by_id_reserved.side_effect = ['1', '2']
+        pickings = []
+        for picking_id in (1, 2):
+            picking = mock.Mock(id=picking_id,
+                                notified2carrier=False,
+                                lines_manifest='LINE%d' % picking_id,
+                                datetime_label='2015-01-01 00:00:00')
+            picking.carrier_id.tnt_config_id.is_test = True
+            pickings.append(picking)
+        generator = TNTFileGenerator('tnt')
+        files = list(generator._generate_files_chunked(pickings,
+                                                       configuration))
+        self.assertEqual(len(files), 2)
+        for (filename, file_handle, picking_ids), number, picking_id in zip(
+                files, ('0001', '0002'), (1, 2)):
+            self.assertTrue(filename.startswith('FD6CNFF_CO_'))
+            self.assertTrue(filename.endswith('.%s' % number))
+            self.assertEqual(picking_ids, [picking_id])
+            self.assertEqual(file_handle.read(), 'LINE%d\n' % picking_id)
+            file_handle.close()
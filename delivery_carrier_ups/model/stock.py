@@ -79,8 +79,26 @@ class StockPicking(models.Model):
             state_code = ''
         return state_code
 
+    @api.model
+    def _ups_connection(self, ups_config):
+        return UPSConnection(
+            ups_config.access_license, ups_config.username,
+            ups_config.password, ups_config.shipper_number,
+            debug=ups_config.is_test)
+
     @api.multi
-    def _generate_ups_label(self, package_ids=None):
+    def _generate_ups_label(self, package_ids=None, ups_client=None,
+                            tracking_refs=None, packages=None):
+        """ Generate the UPS labels of the picking
+
+        :param ups_client: optional ``UPSConnection`` to reuse, a new one
+                           is opened when None
+        :param tracking_refs: optional dict collecting the tracking
+                              references by picking id, the reference is
+                              written on the picking when None
+        :param packages: optional packages of the picking, read by
+                         the batch
+        """
         self.ensure_one()
         if not self.carrier_id.ups_config_id:
             raise exceptions.Warning(_('No UPS config defined in carrier'))
@@ -91,10 +109,8 @@ class StockPicking(models.Model):
         warehouse_partner = self.picking_type_id.warehouse_id.partner_id
 
         ups_config = self.carrier_id.ups_config_id
-        ups_client = UPSConnection(
-            ups_config.access_license, ups_config.username,
-            ups_config.password, ups_config.shipper_number,
-            debug=ups_config.is_test)
+        if ups_client is None:
+            ups_client = self._ups_connection(ups_config)
 
         warehouse_street = warehouse_partner.street
         if warehouse_partner.street2:
@@ -124,11 +140,11 @@ class StockPicking(models.Model):
             'email': self.partner_id.email or ''
         }
 
-        number_of_packages = self.number_of_packages or 1
+        number_of_packages = self._get_number_of_parcels(packages)
         weight = self.weight or 1
-        packages = []
+        ups_packages = []
         for p in range(number_of_packages):
-            packages.append({
+            ups_packages.append({
                 'packaging_type': '02',
                 'dimensions': {
                     'length': self.length,
@@ -140,7 +156,7 @@ class StockPicking(models.Model):
 
         try:
             shipment = ups_client.create_shipment(
-                from_addr, to_addr, packages, self.ups_service_type,
+                from_addr, to_addr, ups_packages, self.ups_service_type,
                 file_format=ups_config.label_file_format,
                 description=self.ups_shipment_description,
                 dimensions_unit=ups_config.dimension_uom,
@@ -161,7 +177,10 @@ class StockPicking(models.Model):
             }
             labels.append(label)
 
-        self.write({'carrier_tracking_ref': shipment.tracking_number})
+        if tracking_refs is None:
+            self.write({'carrier_tracking_ref': shipment.tracking_number})
+        else:
+            tracking_refs[self.id] = shipment.tracking_number
         return labels
 
     @api.multi
@@ -171,3 +190,26 @@ class StockPicking(models.Model):
             return self._generate_ups_label(package_ids=package_ids)
         return super(StockPicking, self).generate_shipping_labels(
             package_ids=package_ids)
+
+    @api.multi
+    def generate_shipping_labels_batch(self, package_ids=None):
+        """ Open one UPS connection per configuration for the whole batch """
+        if self[:1].carrier_id.type != 'ups':
+            return super(StockPicking, self).generate_shipping_labels_batch(
+                package_ids=package_ids)
+        packages_by_picking = self._get_packages_from_pickings(
+            package_ids=package_ids)
+        connections = {}
+        labels = {}
+        tracking_refs = {}
+        for pick in self:
+            ups_config = pick.carrier_id.ups_config_id
+            if ups_config and ups_config.id not in connections:
+                connections[ups_config.id] = self._ups_connection(ups_config)
+            labels[pick.id] = pick._generate_ups_label(
+                package_ids=package_ids,
+                ups_client=connections.get(ups_config.id),
+                tracking_refs=tracking_refs,
+                packages=packages_by_picking[pick.id])
+        self._write_tracking_refs(tracking_refs)
+        return labels